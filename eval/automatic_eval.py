@@ -1,6 +1,10 @@
 import argparse
+import asyncio
 import csv
-from typing import List
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
 
 from ragas.metrics.collections import Faithfulness, AnswerCorrectness
 from ragas.embeddings import HuggingFaceEmbeddings
@@ -12,85 +16,197 @@
 from src.adapters.llm import get_llm_completer
 from src.application.application import get_initial_history, process_conversation_turn
 
+MAX_CONTEXT_CHARS = 400000  # Simple truncation to avoid exceeding evaluator context window
+
 
 def load_queries(input_path: str) -> List[str]:
     with open(input_path, "r", encoding="utf-8") as f:
         return [line.strip() for line in f if line.strip()]
 
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--input", default="data/eval_dataset/questions.txt", help="Input file with one query per line")
-    parser.add_argument("--ground_truth", default="data/eval_dataset/ground_truth_answers.txt", help="Input file with one ground truth answer per line")
-    parser.add_argument("--output", default="data/eval_dataset/ragas_results.csv", help="Output CSV file")
-    parser.add_argument("--compute-correctness", action="store_true", default=False, help="Whether to compute the AnswerCorrectness metric (requires embeddings and ground truth)")
-    args = parser.parse_args()
-
-    queries = load_queries(args.input)
-    ground_truths = load_queries(args.ground_truth)
+def load_checkpoint(path: str) -> Dict[int, Dict]:
+    """Return completed rows from a previous run, keyed by query index."""
+    rows = {}
+    if not os.path.exists(path):
+        return rows
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                # A crash mid-write leaves at most one truncated trailing line.
+                continue
+            rows[row["index"]] = row
+    return rows
+
+
+def is_complete(row: Dict, query: str, compute_correctness: bool) -> bool:
+    if row.get("query") != query or row.get("faithfulness") is None:
+        return False
+    return not compute_correctness or row.get("answer_correctness") is not None
+
+
+def metric_value(result) -> float:
+    return float(getattr(result, "value", result))
+
+
+def generate_answer(
+    query: str,
+    capturing_retriever: ContextCapturingRetriever,
+    completer,
+) -> Tuple[str, str]:
+    """Run one RAG turn. Runs in a worker thread; the context is captured in that same thread."""
+    history = get_initial_history()
+    try:
+        response, _, _ = process_conversation_turn(history, query, capturing_retriever, completer)
+    finally:
+        # Always clear this thread's capture, or a failed turn would make every later
+        # query on the same worker thread fail too.
+        context = capturing_retriever.get_captured_context()
+    return response, context
+
+
+async def evaluate_query(
+    index: int,
+    query: str,
+    ground_truth: str,
+    capturing_retriever: ContextCapturingRetriever,
+    completer,
+    faithfulness_metric,
+    correctness_metric,
+    generation_slots: asyncio.Semaphore,
+    judge_slots: asyncio.Semaphore,
+) -> Dict:
+    async with generation_slots:
+        print(f'Generating answer for query index {index}.\nQuery is:\n{query}')
+        response, captured_context = await asyncio.to_thread(
+            generate_answer, query, capturing_retriever, completer
+        )
+    captured_context = captured_context[:MAX_CONTEXT_CHARS]
 
-    if len(queries) != len(ground_truths):
-        raise ValueError(f"Number of queries ({len(queries)}) and ground truths ({len(ground_truths)}) must match")
+    # Judging holds its own slot, so the next generations start while this one is scored.
+    async with judge_slots:
+        scores = [
+            faithfulness_metric.ascore(
+                user_input=query,
+                response=response,
+                retrieved_contexts=[captured_context],
+            )
+        ]
+        if correctness_metric is not None:
+            scores.append(
+                correctness_metric.ascore(
+                    user_input=query,
+                    response=response,
+                    reference=ground_truth,
+                )
+            )
+        results = await asyncio.gather(*scores)
+
+    row = {
+        "index": index,
+        "query": query,
+        "context": captured_context,
+        "answer": response,
+        "ground_truth": ground_truth,
+        "faithfulness": metric_value(results[0]),
+    }
+    if correctness_metric is not None:
+        row["answer_correctness"] = metric_value(results[1])
+    return row
+
+
+async def run_evaluation(args, queries: List[str], ground_truths: List[str]) -> Dict[int, Dict]:
+    rows = load_checkpoint(args.checkpoint)
+    pending = [
+        i for i, query in enumerate(queries)
+        if i not in rows or not is_complete(rows[i], query, args.compute_correctness)
+    ]
+    print(f"{len(queries) - len(pending)} queries already checkpointed in {args.checkpoint}, {len(pending)} to run.")
+    if not pending:
+        return rows
+
+    # asyncio.to_thread runs on the default executor; size it to the generation cap.
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=args.concurrency))
 
     base_retriever = QdrantCodeRetriever()
     capturing_retriever = ContextCapturingRetriever(base_retriever)
     completer = get_llm_completer()
     judge_llm = llm_factory('gpt-4o-mini', client=AsyncOpenAI(), max_tokens=16384)
-    
-    embeddings = HuggingFaceEmbeddings(model="mixedbread-ai/mxbai-embed-large-v1")
-    
+
     faithfulness_metric = Faithfulness(llm=judge_llm)
     correctness_metric = None
     if args.compute_correctness:
+        embeddings = HuggingFaceEmbeddings(model="mixedbread-ai/mxbai-embed-large-v1")
         correctness_metric = AnswerCorrectness(llm=judge_llm, embeddings=embeddings)
 
-    questions = []
-    contexts_list = []
-    answers = []
-    ground_truth_list = []
-    faith_scores = []
-    corr_scores = [] if args.compute_correctness else None
+    generation_slots = asyncio.Semaphore(args.concurrency)
+    judge_slots = asyncio.Semaphore(args.judge_concurrency)
+
+    tasks = [
+        asyncio.create_task(evaluate_query(
+            i, queries[i], ground_truths[i], capturing_retriever, completer,
+            faithfulness_metric, correctness_metric, generation_slots, judge_slots,
+        ))
+        for i in pending
+    ]
+
+    failures = 0
+    with open(args.checkpoint, "a", encoding="utf-8") as checkpoint:
+        for finished in asyncio.as_completed(tasks):
+            try:
+                row = await finished
+            except Exception as exc:
+                failures += 1
+                print(f"Query failed ({type(exc).__name__}: {exc}); it will be retried on the next run.")
+                continue
+            rows[row["index"]] = row
+            checkpoint.write(json.dumps(row) + "\n")
+            checkpoint.flush()
+            os.fsync(checkpoint.fileno())
+            print(f"Checkpointed query index {row['index']} ({len(rows)}/{len(queries)}), faithfulness {row['faithfulness']:.3f}")
+
+    if failures:
+        print(f"⚠️  {failures} queries failed. Rerun the same command to retry only those.")
+    return rows
 
-    for index, query in enumerate(queries):
-        print(f'Processing query index {index}.\nQuery is:\n{query}')
-        history = get_initial_history()
 
-        response, _, _ = process_conversation_turn(
-            history, query, capturing_retriever, completer
-        )
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", default="data/eval_dataset/questions.txt", help="Input file with one query per line")
+    parser.add_argument("--ground_truth", default="data/eval_dataset/ground_truth_answers.txt", help="Input file with one ground truth answer per line")
+    parser.add_argument("--output", default="data/eval_dataset/ragas_results.csv", help="Output CSV file")
+    parser.add_argument("--checkpoint", default=None, help="JSONL file of completed rows; reruns skip them (default: <output>.checkpoint.jsonl)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Maximum number of answers generated at once")
+    parser.add_argument("--judge-concurrency", type=int, default=8, help="Maximum number of answers being judged at once")
+    parser.add_argument("--compute-correctness", action="store_true", default=False, help="Whether to compute the AnswerCorrectness metric (requires embeddings and ground truth)")
+    args = parser.parse_args()
+    if args.checkpoint is None:
+        args.checkpoint = args.output + ".checkpoint.jsonl"
 
-        captured_context = capturing_retriever.get_captured_context()
-        captured_context = captured_context[:400000]  # Simple truncation to avoid exceeding evaluator context window
-        ground_truth = ground_truths[index]
-
-        questions.append(query)
-        contexts_list.append([captured_context])  
-        answers.append(response)
-        ground_truth_list.append(ground_truth)
-        
-        # Always compute faithfulness
-        faithfulness_result = faithfulness_metric.score(
-            user_input=query,
-            response=response,
-            retrieved_contexts=[captured_context]
-        )
-        faith_scores.append(faithfulness_result)
-        
-        # Optionally compute correctness
-        if args.compute_correctness:
-            correctness_result = correctness_metric.score(
-                user_input=query,
-                response=response,
-                reference=ground_truth
-            )
-            corr_scores.append(correctness_result)
+    queries = load_queries(args.input)
+    ground_truths = load_queries(args.ground_truth)
+
+    if len(queries) != len(ground_truths):
+        raise ValueError(f"Number of queries ({len(queries)}) and ground truths ({len(ground_truths)}) must match")
+
+    rows = asyncio.run(run_evaluation(args, queries, ground_truths))
+    completed = [
+        rows[i] for i, query in enumerate(queries)
+        if i in rows and is_complete(rows[i], query, args.compute_correctness)
+    ]
+    if not completed:
+        print("No completed queries to report.")
+        return
 
     # Build dataset (kept for compatibility / future use)
     eval_dataset = Dataset.from_dict({
-        "question": questions,
-        "contexts": contexts_list,
-        "answer": answers,
-        "ground_truth": ground_truth_list,
+        "question": [row["query"] for row in completed],
+        "contexts": [[row["context"]] for row in completed],
+        "answer": [row["answer"] for row in completed],
+        "ground_truth": [row["ground_truth"] for row in completed],
     })
 
     # Write CSV
@@ -101,22 +217,18 @@ def main():
             header.append("answer_correctness")
         writer.writerow(header)
 
-        for i in range(len(questions)):
-            row = [
-                questions[i],
-                contexts_list[i][0],
-                answers[i],
-                ground_truth_list[i],
-                faith_scores[i]
-            ]
+        for row in completed:
+            values = [row[column] for column in header[:4]] + [row["faithfulness"]]
             if args.compute_correctness:
-                row.append(corr_scores[i])
-            writer.writerow(row)
+                values.append(row["answer_correctness"])
+            writer.writerow(values)
 
-    print(f"Evaluation complete. Results written to {args.output}")
+    faith_scores = [row["faithfulness"] for row in completed]
+    print(f"Evaluation complete. Results written to {args.output} ({len(completed)}/{len(queries)} queries)")
     print(f"Average faithfulness: {sum(faith_scores)/len(faith_scores):.3f} (n={len(faith_scores)})")
     if args.compute_correctness:
+        corr_scores = [row["answer_correctness"] for row in completed]
         print(f"Average answer_correctness: {sum(corr_scores)/len(corr_scores):.3f} (n={len(corr_scores)})")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
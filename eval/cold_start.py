@@ -0,0 +1,85 @@
+"""Measure cold start: process launch to bot importable, to warm, to first answer.
+
+Each run launches a fresh interpreter, so caches and loaded models do not carry over.
+Phases are reported in seconds since the child process was spawned:
+  - import:        `src.interfaces.discord_bot` imported, i.e. the bot could connect to Discord
+  - warm:          embedding model loaded and a dummy encode/search done (skipped on trees without warm_up)
+  - first answer:  first turn finished
+  - second answer: duration of a second turn, for comparison with a fully warm process
+
+Run it on two commits to compare start-up before and after a change, e.g.:
+    python -m eval.cold_start --runs 3 --retrieval-only
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+CHILD = r"""
+import json, sys, time
+query, retrieval_only = sys.argv[1], sys.argv[2] == "1"
+phases = {}
+from src.interfaces import discord_bot
+phases["import"] = time.time()
+try:
+    from src.adapters.retrieval import warm_up
+except ImportError:
+    pass
+else:
+    warm_up()
+    phases["warm"] = time.time()
+from src.application.application import get_initial_history, process_conversation_turn
+
+def answer():
+    if retrieval_only:
+        discord_bot.code_retriever.retrieve(query, top_k=10)
+    else:
+        process_conversation_turn(get_initial_history(), query, discord_bot.code_retriever, discord_bot.llm_completer)
+
+answer()
+phases["first_answer"] = time.time()
+started = time.time()
+answer()
+phases["second_answer_duration"] = time.time() - started
+print(json.dumps(phases))
+"""
+
+
+def run_once(query: str, retrieval_only: bool) -> dict:
+    spawned = time.time()
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD, query, "1" if retrieval_only else "0"],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"Cold-start run failed:\n{result.stderr.strip()}")
+    phases = json.loads(result.stdout.strip().splitlines()[-1])
+    return {
+        name: value if name.endswith("_duration") else value - spawned
+        for name, value in phases.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start-to-first-answer")
+    parser.add_argument("--runs", type=int, default=3, help="Number of fresh processes to launch")
+    parser.add_argument("--query", default="Where is CameraShake defined and how is it triggered?")
+    parser.add_argument("--retrieval-only", action="store_true", help="Time retrieval only, without LLM calls")
+    args = parser.parse_args()
+
+    runs = []
+    for index in range(args.runs):
+        phases = run_once(args.query, args.retrieval_only)
+        runs.append(phases)
+        print(f"Run {index + 1}: " + ", ".join(f"{name} {value:.2f}s" for name, value in phases.items()))
+
+    print("\nMedian over runs:")
+    for name in runs[0]:
+        print(f"  {name:<24} {statistics.median(run[name] for run in runs):.2f}s")
+
+
+if __name__ == "__main__":
+    main()
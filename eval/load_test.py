@@ -0,0 +1,509 @@
+"""End-to-end load test for the Discord bot.
+
+Drives `hy_command` and `clear_history` from `src/interfaces/discord_bot.py` with
+simulated `commands.Context` objects, a local stand-in LLM server and an in-memory
+Qdrant index, so no real Discord, LiteLLM or Qdrant server is needed.
+
+Run from the repository root, e.g.:
+    python -m eval.load_test --rates 0.5,1,2,4 --duration 60 --users 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+from aiohttp import web
+
+
+SAMPLE_QUERIES = [
+    "Where is the player join event fired?",
+    "How does the weather system pick the next weather?",
+    "Which class handles block breaking on the server?",
+    "How do I register a custom command in a plugin?",
+    "What packets are sent when a player changes world?",
+    "How does the entity component system store components?",
+    "Where is CameraShake defined and how is it triggered?",
+    "Explain how chunk loading is scheduled.",
+]
+
+ERROR_PREFIX = "Sorry, something went wrong"
+
+
+# --- Stand-in LLM server -------------------------------------------------------------
+
+class FakeLLMServer:
+    """OpenAI-compatible `/chat/completions` endpoint with tunable latency and token rate.
+
+    Runs its own event loop in a background thread so it does not add work to the
+    bot's loop being measured. Supports both plain and `stream=True` requests.
+    """
+
+    def __init__(self, latency: float, jitter: float, tokens: int, token_rate: float):
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens = tokens
+        self.token_rate = token_rate
+        self.port = _free_port()
+        self._loop = asyncio.new_event_loop()
+        self._started = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self):
+        self._thread.start()
+        self._started.wait()
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        app = web.Application()
+        app.router.add_post("/chat/completions", self._handle)
+        runner = web.AppRunner(app)
+        self._loop.run_until_complete(runner.setup())
+        self._loop.run_until_complete(web.TCPSite(runner, "127.0.0.1", self.port).start())
+        self._started.set()
+        self._loop.run_forever()
+
+    def _token_pieces(self) -> List[str]:
+        body = "\n".join(
+            f"    public void step{i}(World world) {{ world.tick({i}); }}" for i in range(self.tokens // 12 + 1)
+        )
+        text = (
+            "Found in `server/core/Example.java:10-40`. Relevant code:\n\n"
+            f"```java\npublic class Example {{\n{body}\n}}\n```\n\nThat's where it happens."
+        )
+        # Roughly 4 characters per token.
+        pieces = [text[i:i + 4] for i in range(0, len(text), 4)]
+        return pieces[:self.tokens] if self.tokens else pieces
+
+    async def _handle(self, request: web.Request) -> web.StreamResponse:
+        payload = await request.json()
+        model = payload.get("model", "fake")
+        created = int(time.time())
+        pieces = self._token_pieces()
+
+        delay = max(0.0, random.gauss(self.latency, self.jitter))
+        await asyncio.sleep(delay)
+        per_token = 1.0 / self.token_rate if self.token_rate > 0 else 0.0
+        usage = {"prompt_tokens": 0, "completion_tokens": len(pieces), "total_tokens": len(pieces)}
+
+        if not payload.get("stream"):
+            await asyncio.sleep(per_token * len(pieces))
+            return web.json_response({
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(pieces)},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            })
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        try:
+            await self._stream(request, response, model, created, pieces, per_token, usage, payload)
+        except ConnectionResetError:
+            pass  # The client closed the stream, e.g. a hedged request that lost the race
+        return response
+
+    async def _stream(self, request, response, model, created, pieces, per_token, usage, payload):
+        await response.prepare(request)
+        for piece in pieces + [None]:
+            chunk = {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "delta": {"content": piece} if piece is not None else {},
+                    "finish_reason": None if piece is not None else "stop",
+                }],
+            }
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            if piece is not None and per_token:
+                await asyncio.sleep(per_token)
+        if payload.get("stream_options", {}).get("include_usage"):
+            chunk = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": created,
+                     "model": model, "choices": [], "usage": usage}
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# --- Local vector index ----------------------------------------------------------------
+
+def build_local_index(retrieval, collection_name: str, dimension: int, size: int, chunks_file: Optional[str]):
+    """Replace the retriever's Qdrant client with an in-memory one holding `size` points.
+
+    Vectors are random unit vectors: the point is realistic search and payload cost,
+    not answer quality. Payloads come from `chunks_file` when given.
+    """
+    from qdrant_client import QdrantClient
+    from qdrant_client.models import Distance, PointStruct, VectorParams
+
+    source = []
+    if chunks_file:
+        with open(chunks_file, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    source.append(json.loads(line))
+                if len(source) >= size:
+                    break
+
+    client = QdrantClient(":memory:")
+    client.create_collection(
+        collection_name=collection_name,
+        vectors_config=VectorParams(size=dimension, distance=Distance.COSINE),
+    )
+
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(size, dimension)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    points = []
+    for i in range(size):
+        if source:
+            chunk = source[i % len(source)]
+            payload = {
+                "path": chunk["path"],
+                "content": chunk["content"],
+                "metadata": chunk.get("metadata", {}),
+                "class_names": [],
+                "method_names": [],
+            }
+        else:
+            payload = {
+                "path": f"com/hypixel/hytale/server/synthetic/Synthetic{i}.java",
+                "content": "\n".join(
+                    f"    public void handle{j}(PlayerRef player) {{ player.sendMessage(\"{j}\"); }}"
+                    for j in range(60)
+                ),
+                "metadata": {"type": "full_file"},
+                "class_names": [f"Synthetic{i}"],
+                "method_names": [f"handle{j}" for j in range(60)],
+            }
+        points.append(PointStruct(id=i, vector=vectors[i].tolist(), payload=payload))
+    client.upsert(collection_name=collection_name, points=points)
+
+    retrieval.emb_client = client
+
+
+# --- Simulated discord.py context ---------------------------------------------------------
+
+class FakeChannel:
+    def __init__(self, channel_id: int, api_latency: float):
+        self.id = channel_id
+        self.api_latency = api_latency
+        self.api_calls = 0
+
+    async def api_call(self):
+        self.api_calls += 1
+        if self.api_latency:
+            await asyncio.sleep(self.api_latency)
+
+
+class FakeMessage:
+    def __init__(self, channel: FakeChannel, content: Optional[str]):
+        self.channel = channel
+        self.content = content
+
+    async def edit(self, content: Optional[str] = None, **kwargs):
+        await self.channel.api_call()
+        self.content = content
+        return self
+
+
+class FakeAuthor:
+    def __init__(self, user_id: int):
+        self.id = user_id
+
+
+class _FakeTyping:
+    def __init__(self, channel: FakeChannel):
+        self.channel = channel
+
+    async def __aenter__(self):
+        await self.channel.api_call()
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeContext:
+    """The subset of `commands.Context` the bot commands use."""
+
+    def __init__(self, user_id: int, channel: FakeChannel):
+        self.author = FakeAuthor(user_id)
+        self.channel = channel
+        self.messages: List[FakeMessage] = []
+
+    async def send(self, content: Optional[str] = None, **kwargs) -> FakeMessage:
+        await self.channel.api_call()
+        message = FakeMessage(self.channel, content)
+        self.messages.append(message)
+        return message
+
+    def typing(self) -> _FakeTyping:
+        return _FakeTyping(self.channel)
+
+    @property
+    def failed(self) -> bool:
+        return any((m.content or "").startswith(ERROR_PREFIX) for m in self.messages)
+
+
+# --- Instrumentation ---------------------------------------------------------------
+
+class InstrumentedExecutor(ThreadPoolExecutor):
+    """Default executor that tracks queued and running work items (what `asyncio.to_thread` uses)."""
+
+    def __init__(self, max_workers: int):
+        super().__init__(max_workers=max_workers, thread_name_prefix="loadtest")
+        self.max_workers = max_workers
+        self.in_flight = 0
+        self.running = 0
+        self._lock = threading.Lock()
+
+    def submit(self, fn, /, *args, **kwargs):
+        with self._lock:
+            self.in_flight += 1
+
+        def run():
+            with self._lock:
+                self.running += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.running -= 1
+                    self.in_flight -= 1
+
+        return super().submit(run)
+
+    @property
+    def queued(self) -> int:
+        return self.in_flight - self.running
+
+
+def histories_footprint(histories: Dict[int, List[Dict]]) -> Dict[str, int]:
+    messages = sum(len(h) for h in histories.values())
+    content_bytes = sum(len(m.get("content", "").encode("utf-8")) for h in histories.values() for m in h)
+    return {"users": len(histories), "messages": messages, "content_bytes": content_bytes}
+
+
+async def monitor(executor: InstrumentedExecutor, histories, stop: asyncio.Event, interval: float, samples: Dict):
+    last_history_sample = 0.0
+    while not stop.is_set():
+        before = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples["loop_lag"].append(time.perf_counter() - before - interval)
+        samples["queued"].append(executor.queued)
+        samples["saturated"].append(executor.running >= executor.max_workers)
+        if before - last_history_sample >= 1.0:
+            samples["histories"].append(histories_footprint(histories))
+            last_history_sample = before
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return float("nan")
+    return float(np.percentile(np.asarray(values), pct))
+
+
+# --- Load generation -----------------------------------------------------------------
+
+async def run_rate(bot_module, rate: float, args, channels: List[FakeChannel]) -> Dict:
+    loop = asyncio.get_running_loop()
+    executor = InstrumentedExecutor(args.threads)
+    loop.set_default_executor(executor)
+    bot_module.histories.clear()
+
+    latencies: List[float] = []
+    clear_latencies: List[float] = []
+    errors = 0
+    samples = {"loop_lag": [], "queued": [], "saturated": [], "histories": []}
+    stop = asyncio.Event()
+    monitor_task = asyncio.create_task(monitor(executor, bot_module.histories, stop, args.sample_interval, samples))
+    api_calls_before = sum(c.api_calls for c in channels)
+
+    async def one_request(user_id: int):
+        nonlocal errors
+        ctx = FakeContext(user_id, channels[user_id % len(channels)])
+        started = time.perf_counter()
+        if random.random() < args.clear_prob:
+            await bot_module.clear_history(ctx)
+            clear_latencies.append(time.perf_counter() - started)
+            return
+        await bot_module.hy_command(ctx, query=random.choice(SAMPLE_QUERIES))
+        latencies.append(time.perf_counter() - started)
+        if ctx.failed:
+            errors += 1
+
+    tasks = []
+    started = time.perf_counter()
+    deadline = started + args.duration
+    while time.perf_counter() < deadline:
+        tasks.append(asyncio.create_task(one_request(random.randrange(args.users))))
+        await asyncio.sleep(random.expovariate(rate))
+    arrivals_done = time.perf_counter()
+
+    done, pending = await asyncio.wait(tasks, timeout=args.drain_timeout) if tasks else (set(), set())
+    for task in pending:
+        task.cancel()
+    finished = time.perf_counter()
+    stop.set()
+    await monitor_task
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    completed = len(latencies)
+    history_samples = samples["histories"] or [histories_footprint(bot_module.histories)]
+    return {
+        "offered_rate": rate,
+        "requests": len(tasks),
+        "completed": completed,
+        "errors": errors,
+        "timed_out": len(pending),
+        "throughput": completed / (finished - started) if finished > started else 0.0,
+        "arrival_window_seconds": round(arrivals_done - started, 2),
+        "latency_p50": percentile(latencies, 50),
+        "latency_p90": percentile(latencies, 90),
+        "latency_p95": percentile(latencies, 95),
+        "latency_p99": percentile(latencies, 99),
+        "latency_max": max(latencies) if latencies else float("nan"),
+        "clear_latency_p95": percentile(clear_latencies, 95),
+        "loop_lag_p50_ms": percentile(samples["loop_lag"], 50) * 1000,
+        "loop_lag_p99_ms": percentile(samples["loop_lag"], 99) * 1000,
+        "loop_lag_max_ms": max(samples["loop_lag"], default=0.0) * 1000,
+        "executor_threads": args.threads,
+        "executor_queue_max": max(samples["queued"], default=0),
+        "executor_queue_mean": statistics.fmean(samples["queued"]) if samples["queued"] else 0.0,
+        "executor_saturated_fraction": statistics.fmean(samples["saturated"]) if samples["saturated"] else 0.0,
+        "histories_start": history_samples[0],
+        "histories_end": histories_footprint(bot_module.histories),
+        "discord_api_calls": sum(c.api_calls for c in channels) - api_calls_before,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def print_report(results: List[Dict], slo: float):
+    columns = [
+        ("offered_rate", "rate/s", "{:.2f}"),
+        ("completed", "done", "{}"),
+        ("errors", "err", "{}"),
+        ("throughput", "tput/s", "{:.2f}"),
+        ("latency_p50", "p50 s", "{:.2f}"),
+        ("latency_p95", "p95 s", "{:.2f}"),
+        ("latency_p99", "p99 s", "{:.2f}"),
+        ("loop_lag_p99_ms", "lag p99 ms", "{:.1f}"),
+        ("executor_queue_max", "queue max", "{}"),
+        ("executor_saturated_fraction", "saturated", "{:.0%}"),
+        ("peak_rss_mb", "rss MB", "{:.0f}"),
+    ]
+    print(" | ".join(title for _, title, _ in columns))
+    for result in results:
+        print(" | ".join(fmt.format(result[key]) for key, _, fmt in columns))
+        end = result["histories_end"]
+        print(f"    histories: {end['users']} users, {end['messages']} messages, {end['content_bytes'] / 1024:.0f} KiB")
+
+    sustainable = [
+        r for r in results
+        if r["latency_p95"] <= slo and r["throughput"] >= 0.9 * r["offered_rate"] and not r["timed_out"]
+    ]
+    if sustainable:
+        best = max(sustainable, key=lambda r: r["throughput"])
+        print(f"\nThroughput ceiling (p95 <= {slo:.1f}s): ~{best['throughput']:.2f} requests/s "
+              f"at offered {best['offered_rate']:.2f}/s")
+    else:
+        print(f"\nNo tested rate met p95 <= {slo:.1f}s.")
+
+
+async def run(args) -> List[Dict]:
+    # Imported here: the bot reads its LLM settings and METRICS_FILE from the environment at import time.
+    from src.adapters import retrieval
+    from src.config import COLLECTION_NAME
+    from src.interfaces import discord_bot
+
+    build_local_index(
+        retrieval,
+        COLLECTION_NAME,
+        retrieval.get_embedder().dimension(),
+        args.index_size,
+        args.chunks,
+    )
+    # Commands wait for readiness; warm up here as the bot's setup_hook would.
+    await discord_bot.warm_up_retrieval()
+
+    channels = [FakeChannel(i, args.discord_latency) for i in range(args.channels)]
+    results = []
+    for rate in args.rates:
+        print(f"Running offered rate {rate:.2f}/s for {args.duration:.0f}s...", file=sys.stderr)
+        results.append(await run_rate(discord_bot, rate, args, channels))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the Discord bot with simulated users")
+    parser.add_argument("--rates", default="0.5,1,2,4", help="Comma-separated arrival rates (requests/second) to sweep")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of arrivals per rate")
+    parser.add_argument("--drain-timeout", type=float, default=300.0, help="Seconds to wait for in-flight requests after arrivals stop")
+    parser.add_argument("--users", type=int, default=100, help="Number of synthetic users")
+    parser.add_argument("--channels", type=int, default=5, help="Number of simulated channels users are spread over")
+    parser.add_argument("--clear-prob", type=float, default=0.05, help="Probability an arrival is !clear instead of !hy")
+    parser.add_argument("--threads", type=int, default=min(32, (os.cpu_count() or 1) + 4), help="Default executor size (asyncio.to_thread workers)")
+    parser.add_argument("--discord-latency", type=float, default=0.05, help="Simulated Discord API round-trip in seconds")
+    parser.add_argument("--llm-latency", type=float, default=2.0, help="Stand-in LLM time to first token in seconds")
+    parser.add_argument("--llm-jitter", type=float, default=0.5, help="Standard deviation of the LLM time to first token")
+    parser.add_argument("--llm-tokens", type=int, default=600, help="Tokens per stand-in LLM answer")
+    parser.add_argument("--llm-token-rate", type=float, default=150.0, help="Stand-in LLM output tokens per second")
+    parser.add_argument("--index-size", type=int, default=2000, help="Points in the in-memory vector index")
+    parser.add_argument("--chunks", default=None, help="Optional chunks.jsonl to take index payloads from")
+    parser.add_argument("--sample-interval", type=float, default=0.05, help="Event-loop lag sampling interval in seconds")
+    parser.add_argument("--slo", type=float, default=30.0, help="p95 latency target used to report the throughput ceiling")
+    parser.add_argument("--output", default=None, help="Optional JSON file for the full results")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    args.rates = [float(r) for r in args.rates.split(",") if r.strip()]
+    random.seed(args.seed)
+
+    server = FakeLLMServer(args.llm_latency, args.llm_jitter, args.llm_tokens, args.llm_token_rate)
+    server.start()
+    os.environ["LITELLM_API_BASE"] = server.base_url
+    os.environ.setdefault("LITELLM_MASTER_KEY", "load-test")
+    # Keeps the simulated traffic out of the production metrics file.
+    metrics_file = os.path.join(tempfile.mkdtemp(prefix="loadtest-"), "usage_metrics.jsonl")
+    os.environ["METRICS_FILE"] = metrics_file
+
+    results = asyncio.run(run(args))
+    print(f"Bot metrics for this run written to {metrics_file}", file=sys.stderr)
+    print_report(results, args.slo)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
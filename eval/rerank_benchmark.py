@@ -0,0 +1,133 @@
+"""Compare the dense+boost pipeline against cross-encoder reranking with a smaller top-k.
+
+For each question both arms run a full turn. The script records retrieval and LLM
+latency, prompt tokens, and RAGAS faithfulness (plus answer correctness when ground
+truth is given) so a smaller RETRIEVAL_RERANKED_TOP_K can be checked before it ships.
+
+Requires RERANKER_MODEL_NAME to be set. Run from the repository root, e.g.:
+    RERANKER_MODEL_NAME=cross-encoder/ms-marco-MiniLM-L-6-v2 python -m eval.rerank_benchmark
+"""
+import argparse
+import csv
+import statistics
+import time
+from typing import Dict, List, Optional
+
+import tiktoken
+from openai import AsyncOpenAI
+from ragas.embeddings import HuggingFaceEmbeddings
+from ragas.llms import llm_factory
+from ragas.metrics.collections import AnswerCorrectness, Faithfulness
+
+from src.adapters.llm import get_llm_completer
+from src.adapters.retrieval import QdrantCodeRetriever
+from src.application.application import complete_conversation_turn, get_initial_history
+from src.config import RERANKER_MODEL_NAME, RETRIEVAL_RERANKED_TOP_K
+
+encoding = tiktoken.get_encoding("o200k_base")
+
+
+def load_queries(input_path: str) -> List[str]:
+    with open(input_path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def run_arm(
+    name: str,
+    query: str,
+    retriever: QdrantCodeRetriever,
+    top_k: int,
+    completer,
+    faithfulness_metric,
+    correctness_metric,
+    ground_truth: Optional[str],
+) -> Dict:
+    history = get_initial_history()
+
+    started = time.perf_counter()
+    context = retriever.retrieve(query, top_k=top_k)
+    retrieved = time.perf_counter()
+    response, _, _ = complete_conversation_turn(history, query, context, completer)
+    finished = time.perf_counter()
+
+    faithfulness = faithfulness_metric.score(user_input=query, response=response, retrieved_contexts=[context])
+    prompt = history[0]["content"] + f"More code context:\n{context}\n\nQuestion: {query}"
+    row = {
+        "arm": name,
+        "query": query,
+        "top_k": top_k,
+        "retrieval_seconds": retrieved - started,
+        "llm_seconds": finished - retrieved,
+        "total_seconds": finished - started,
+        "prompt_tokens": len(encoding.encode(prompt)),
+        "answer": response,
+        "faithfulness": float(getattr(faithfulness, "value", faithfulness)),
+    }
+    if correctness_metric is not None:
+        result = correctness_metric.score(user_input=query, response=response, reference=ground_truth)
+        row["answer_correctness"] = float(getattr(result, "value", result))
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", default="data/eval_dataset/questions.txt", help="Input file with one query per line")
+    parser.add_argument("--ground_truth", default=None, help="Optional file with one ground truth answer per line (enables answer correctness)")
+    parser.add_argument("--baseline-top-k", type=int, default=50, help="Chunks sent without reranking")
+    parser.add_argument("--reranked-top-k", type=int, default=RETRIEVAL_RERANKED_TOP_K, help="Chunks sent after reranking")
+    parser.add_argument("--output", default="data/eval_dataset/rerank_benchmark.csv", help="Output CSV with one row per query and arm")
+    args = parser.parse_args()
+
+    if not RERANKER_MODEL_NAME:
+        raise ValueError("Set RERANKER_MODEL_NAME to benchmark reranking.")
+
+    queries = load_queries(args.input)
+    ground_truths = load_queries(args.ground_truth) if args.ground_truth else [None] * len(queries)
+    if len(queries) != len(ground_truths):
+        raise ValueError(f"Number of queries ({len(queries)}) and ground truths ({len(ground_truths)}) must match")
+
+    completer = get_llm_completer()
+    judge_llm = llm_factory('gpt-4o-mini', client=AsyncOpenAI(), max_tokens=16384)
+    faithfulness_metric = Faithfulness(llm=judge_llm)
+    correctness_metric = None
+    if args.ground_truth:
+        embeddings = HuggingFaceEmbeddings(model="mixedbread-ai/mxbai-embed-large-v1")
+        correctness_metric = AnswerCorrectness(llm=judge_llm, embeddings=embeddings)
+
+    arms = [
+        ("baseline", QdrantCodeRetriever(use_reranker=False), args.baseline_top_k),
+        ("reranked", QdrantCodeRetriever(use_reranker=True), args.reranked_top_k),
+    ]
+
+    rows = []
+    for index, (query, ground_truth) in enumerate(zip(queries, ground_truths)):
+        print(f"Processing query {index + 1}/{len(queries)}: {query}")
+        for name, retriever, top_k in arms:
+            row = run_arm(name, query, retriever, top_k, completer, faithfulness_metric, correctness_metric, ground_truth)
+            rows.append(row)
+            print(f"  {name:<9} {row['total_seconds']:6.2f}s  {row['prompt_tokens']:>7} prompt tokens  faithfulness {row['faithfulness']:.3f}")
+
+    with open(args.output, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+
+    print()
+    for name, _, top_k in arms:
+        arm_rows = [row for row in rows if row["arm"] == name]
+        summary = (
+            f"{name} (top_k={top_k}): "
+            f"mean total {statistics.fmean(r['total_seconds'] for r in arm_rows):.2f}s "
+            f"(retrieval {statistics.fmean(r['retrieval_seconds'] for r in arm_rows):.2f}s, "
+            f"LLM {statistics.fmean(r['llm_seconds'] for r in arm_rows):.2f}s), "
+            f"mean prompt tokens {statistics.fmean(r['prompt_tokens'] for r in arm_rows):.0f}, "
+            f"faithfulness {statistics.fmean(r['faithfulness'] for r in arm_rows):.3f}"
+        )
+        if correctness_metric is not None:
+            summary += f", answer_correctness {statistics.fmean(r['answer_correctness'] for r in arm_rows):.3f}"
+        print(summary)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
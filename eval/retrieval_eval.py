@@ -0,0 +1,199 @@
+"""Retrieval-only evaluation: recall@k, MRR and nDCG@k with no LLM calls.
+
+The labeled set is a JSONL file, one question per line:
+    {"query": "Where is CameraShake triggered?",
+     "expected": [{"path": "builtin/adventure/camera/asset/camerashake/CameraShake.java", "lines": [45, 67]}]}
+`lines` is optional; without it any chunk of the file counts. `expected` may also be a
+plain list of paths.
+
+All queries are embedded in one batch and searched with batched Qdrant requests, once,
+at the largest candidate limit of the grid. Every grid point (top-k, keyword boost,
+candidate multiplier) is then re-ranked and scored from those arrays, so a sweep costs
+one search pass. Chunk sizes change the index itself: point --collection at a collection
+built with different chunking to compare them.
+
+Run from the repository root, e.g.:
+    python -m eval.retrieval_eval --labels data/eval_dataset/retrieval_labels.jsonl \
+        --top-k 5,8,10,20,50 --boost 0,0.05,0.15,0.3 --candidate-multiplier 1,3,5
+"""
+import argparse
+import csv
+import itertools
+import json
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from qdrant_client import models
+
+from src.adapters.chunk_store import get_chunk_store
+from src.adapters.retrieval import QdrantCodeRetriever, get_embedder, get_index_version, get_qdrant_client
+from src.config import COLLECTION_NAME, RETRIEVAL_BOOST_WEIGHT
+
+SEARCH_BATCH_SIZE = 64
+
+
+def load_labels(path: str) -> List[Dict]:
+    labeled = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            expected = [e if isinstance(e, dict) else {"path": e} for e in item["expected"]]
+            labeled.append({"query": item["query"], "expected": expected})
+    return labeled
+
+
+def parse_lines(lines_info: str) -> Optional[Tuple[int, int]]:
+    """Parse a chunk's "start–end" lines metadata; None means the full file."""
+    numbers = re.findall(r"\d+", str(lines_info))
+    if len(numbers) != 2:
+        return None
+    return int(numbers[0]), int(numbers[1])
+
+
+def matches(result: Dict, expected: Dict) -> bool:
+    wanted = expected["path"]
+    paths = [result["path"]] + result.get("alias_paths", [])
+    if not any(path == wanted or path.endswith("/" + wanted) for path in paths):
+        return False
+    if "lines" not in expected:
+        return True
+    chunk_range = parse_lines(result["lines_info"])
+    if chunk_range is None:
+        return True
+    start, end = expected["lines"]
+    return chunk_range[0] <= end and start <= chunk_range[1]
+
+
+def search_all(queries: List[str], limit: int, collection: str, batch_size: int) -> List[List[Dict]]:
+    query_vecs = get_embedder().encode(queries, batch_size=batch_size)
+    # Read chunks from the version's chunk store when it has one, like the retriever does.
+    if collection == COLLECTION_NAME:
+        collection = get_index_version()
+    store = get_chunk_store(collection)
+    candidates = []
+    for start in range(0, len(queries), SEARCH_BATCH_SIZE):
+        requests = [
+            models.QueryRequest(query=vec.tolist(), limit=limit, with_payload=store is None)
+            for vec in query_vecs[start:start + SEARCH_BATCH_SIZE]
+        ]
+        responses = get_qdrant_client().query_batch_points(collection_name=collection, requests=requests)
+        candidates.extend(
+            [QdrantCodeRetriever.hit_to_result(hit, store) for hit in response.points] for response in responses
+        )
+    return candidates
+
+
+def build_arrays(labeled: List[Dict], candidates: List[List[Dict]], limit: int):
+    """Dense arrays over (query, candidate[, expected item]), padded where a query has fewer hits."""
+    max_expected = max(len(item["expected"]) for item in labeled)
+    n = len(labeled)
+    scores = np.full((n, limit), -np.inf, dtype=np.float32)
+    keyword_hits = np.zeros((n, limit), dtype=np.float32)
+    match = np.zeros((n, limit, max_expected), dtype=bool)
+    expected_mask = np.zeros((n, max_expected), dtype=bool)
+
+    for q, (item, hits) in enumerate(zip(labeled, candidates)):
+        keywords = QdrantCodeRetriever._extract_keywords(item["query"])
+        expected_mask[q, :len(item["expected"])] = True
+        for c, res in enumerate(hits[:limit]):
+            scores[q, c] = res["score"]
+            if keywords:
+                keyword_hits[q, c] = QdrantCodeRetriever.keyword_hits(keywords, res)
+            for e, expected in enumerate(item["expected"]):
+                match[q, c, e] = matches(res, expected)
+    return scores, keyword_hits, match, expected_mask
+
+
+def score_grid_point(scores, keyword_hits, match, expected_mask, top_k: int, boost: float, candidates: int) -> Dict:
+    scores = scores[:, :candidates]
+    boosted = scores + boost * keyword_hits[:, :candidates] * RETRIEVAL_BOOST_WEIGHT
+    # Stable sort keeps Qdrant's order on ties, as QdrantCodeRetriever.rank does.
+    order = np.argsort(-boosted, axis=1, kind="stable")[:, :top_k]
+    valid = np.take_along_axis(np.isfinite(scores), order, axis=1)
+    top_match = np.take_along_axis(match[:, :candidates], order[:, :, None], axis=1) & valid[:, :, None]
+
+    n_expected = expected_mask.sum(axis=1)
+    found = top_match.any(axis=1) & expected_mask
+    recall = found.sum(axis=1) / n_expected
+
+    relevant = top_match.any(axis=2)
+    ranks = np.arange(1, relevant.shape[1] + 1)
+    first = np.where(relevant.any(axis=1), relevant.argmax(axis=1) + 1, 0)
+    mrr = np.where(first > 0, 1.0 / np.maximum(first, 1), 0.0)
+
+    # Gain only at the first hit of each expected item, so several chunks of one expected file
+    # count once and DCG can never exceed the ideal of n_expected hits at the top.
+    first_hits = np.zeros_like(relevant)
+    q_index, e_index = np.nonzero(found)
+    first_hits[q_index, top_match.argmax(axis=1)[q_index, e_index]] = True
+    discounts = 1.0 / np.log2(ranks + 1)
+    dcg = (first_hits * discounts).sum(axis=1)
+    ideal_counts = np.minimum(n_expected, top_k)
+    idcg = np.cumsum(discounts)[ideal_counts - 1]
+    ndcg = dcg / idcg
+
+    return {
+        "top_k": top_k,
+        "keyword_boost": boost,
+        "candidate_multiplier": candidates // top_k,
+        "recall": float(recall.mean()),
+        "mrr": float(mrr.mean()),
+        "ndcg": float(ndcg.mean()),
+        "hit_rate": float(relevant.any(axis=1).mean()),
+    }
+
+
+def parse_list(value: str, cast):
+    return [cast(v) for v in value.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval-only evaluation (no LLM calls)")
+    parser.add_argument("--labels", default="data/eval_dataset/retrieval_labels.jsonl", help="Labeled JSONL: query plus expected paths/line ranges")
+    parser.add_argument("--collection", default=COLLECTION_NAME, help="Qdrant collection to evaluate")
+    parser.add_argument("--top-k", default="5,8,10,20,30,50", help="Comma-separated k values")
+    parser.add_argument("--boost", default="0,0.05,0.15,0.3", help="Comma-separated per-keyword boost values")
+    parser.add_argument("--candidate-multiplier", default="1,3,5", help="Comma-separated dense candidates per returned chunk")
+    parser.add_argument("--batch-size", type=int, default=32, help="Query embedding batch size")
+    parser.add_argument("--output", default="data/eval_dataset/retrieval_results.csv", help="Output CSV with one row per grid point")
+    args = parser.parse_args()
+
+    top_ks = parse_list(args.top_k, int)
+    boosts = parse_list(args.boost, float)
+    multipliers = parse_list(args.candidate_multiplier, int)
+    limit = max(top_ks) * max(multipliers)
+
+    labeled = load_labels(args.labels)
+    print(f"Loaded {len(labeled)} labeled queries. Searching {limit} candidates each in '{args.collection}'...")
+
+    started = time.perf_counter()
+    candidates = search_all([item["query"] for item in labeled], limit, args.collection, args.batch_size)
+    search_seconds = time.perf_counter() - started
+
+    arrays = build_arrays(labeled, candidates, limit)
+    rows = [
+        score_grid_point(*arrays, top_k=k, boost=b, candidates=k * m)
+        for k, b, m in itertools.product(top_ks, boosts, multipliers)
+    ]
+    total_seconds = time.perf_counter() - started
+
+    rows.sort(key=lambda r: (r["top_k"], -r["ndcg"]))
+    with open(args.output, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+
+    print(f"{'k':>4} {'boost':>6} {'mult':>4} {'recall':>7} {'mrr':>6} {'ndcg':>6}")
+    for row in rows:
+        print(f"{row['top_k']:>4} {row['keyword_boost']:>6.2f} {row['candidate_multiplier']:>4} "
+              f"{row['recall']:>7.3f} {row['mrr']:>6.3f} {row['ndcg']:>6.3f}")
+    print(f"\nEmbedding + search: {search_seconds:.1f}s, full sweep of {len(rows)} grid points: {total_seconds:.1f}s")
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Microbenchmark for the Discord message splitter on very long responses.
+
+Builds synthetic answers of increasing size, mostly one long Java listing (the case that
+used to be quadratic), and times `split_into_messages` on the whole text and
+`iter_messages` fed in small pieces as a streaming completion would deliver them.
+With linear scaling the time per KB stays flat as the size grows:
+    python -m eval.splitter_benchmark --sizes 100,200,400,800
+"""
+import argparse
+import time
+
+from src.config import DISCORD_MESSAGE_LIMIT
+from src.utils import iter_messages, split_into_messages
+
+JAVA_LINE = "        entityStore.getComponent(ref, TransformComponent.getComponentType()).setPosition(position);\n"
+TEXT_LINE = "The handler looks the component up on the entity store and updates the position in place.\n"
+
+
+def make_response(size_kb: int) -> str:
+    target = size_kb * 1024
+    parts = [TEXT_LINE * 5, "```java\n"]
+    code_chars = int(target * 0.9)
+    parts.append(JAVA_LINE * (code_chars // len(JAVA_LINE)))
+    parts.append("```\n")
+    while sum(len(p) for p in parts) < target:
+        parts.append(TEXT_LINE)
+    return "".join(parts)
+
+
+def best_of(repeats: int, fn) -> float:
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the markdown splitter on long responses")
+    parser.add_argument("--sizes", default="100,200,400,800", help="Comma-separated response sizes in KB")
+    parser.add_argument("--piece-size", type=int, default=16, help="Characters per piece when streaming")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--limit", type=int, default=DISCORD_MESSAGE_LIMIT)
+    args = parser.parse_args()
+
+    print(f"{'size':>8} {'messages':>9} {'whole (ms)':>11} {'us/KB':>7} {'streamed (ms)':>14} {'us/KB':>7}")
+    for size_kb in [int(s) for s in args.sizes.split(",")]:
+        text = make_response(size_kb)
+        pieces = [text[i:i + args.piece_size] for i in range(0, len(text), args.piece_size)]
+        messages = split_into_messages(text, limit=args.limit)
+        assert list(iter_messages(pieces, limit=args.limit)) == messages
+
+        whole = best_of(args.repeats, lambda: split_into_messages(text, limit=args.limit))
+        streamed = best_of(args.repeats, lambda: list(iter_messages(pieces, limit=args.limit)))
+        print(
+            f"{size_kb:>6}KB {len(messages):>9} {whole * 1000:>11.1f} {whole * 1e6 / size_kb:>7.1f} "
+            f"{streamed * 1000:>14.1f} {streamed * 1e6 / size_kb:>7.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
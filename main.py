@@ -22,6 +22,13 @@ def run_cli():
     main()
 
 
+def run_embedding_server(host: str, port: int):
+    from src.interfaces.embedding_server import main
+
+    print("Starting embedding server...")
+    main(host=host, port=port)
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Hytale Codebase Assistant – run Discord bot or CLI"
@@ -30,6 +37,11 @@ def main():
 
     discord_parser = subparsers.add_parser("discord", help="Run the Discord bot")
     cli_parser = subparsers.add_parser("cli", help="Run the interactive CLI")
+    embedding_parser = subparsers.add_parser(
+        "embedding-server", help="Serve the embedding model to other processes over HTTP"
+    )
+    embedding_parser.add_argument("--host", default=None, help="Interface to bind (default: EMBEDDING_SERVER_HOST)")
+    embedding_parser.add_argument("--port", type=int, default=None, help="Port to bind (default: EMBEDDING_SERVER_PORT)")
 
     args = parser.parse_args()
 
@@ -37,6 +49,10 @@ def main():
         run_discord()
     elif args.mode == "cli":
         run_cli()
+    elif args.mode == "embedding-server":
+        from src.config import EMBEDDING_SERVER_HOST, EMBEDDING_SERVER_PORT
+
+        run_embedding_server(args.host or EMBEDDING_SERVER_HOST, args.port or EMBEDDING_SERVER_PORT)
 
 
 if __name__ == "__main__":
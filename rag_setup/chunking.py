@@ -1,9 +1,41 @@
 import re
 import json
 from pathlib import Path
+from typing import Dict, List, Set
+
+from src.adapters.chunk_store import ChunkStoreWriter
 
 MAX_CHUNK_CHARS = 12000  # ~7.5k tokens, safe margin
 OVERLAP_LINES = 400
+STORE_DIR = "code_chunks/store"
+
+
+def extract_code_symbols(content: str) -> Dict[str, List[str]]:
+    class_names: Set[str] = set()
+    method_names: Set[str] = set()
+
+    for match in re.finditer(
+        r'(?:public|private|protected|abstract|final)?\s*(?:class|interface|enum|record)\s+([A-Za-z0-9_]+)',
+        content,
+    ):
+        class_names.add(match.group(1))
+
+    method_pattern = (
+        r'(?:public|private|protected|static|final|synchronized)?\s*'
+        r'(?:[\w<>\[\]]+\s+)?([a-zA-Z_][a-zA-Z0-9_]*)\s*\([^)]*\)\s*'
+        r'(?:throws\s+[\w, ]+)?\s*{'
+    )
+    for match in re.finditer(method_pattern, content):
+        method_names.add(match.group(1))
+
+    return {
+        "class_names": list(class_names),
+        "method_names": list(method_names),
+    }
+
+
+def with_symbols(chunk: Dict) -> Dict:
+    return dict(chunk, **extract_code_symbols(chunk["content"]))
 
 def split_large_file(path: str, content: str):
     lines = content.splitlines()
@@ -23,12 +55,14 @@ def split_large_file(path: str, content: str):
         start_line = max(0, end_line - OVERLAP_LINES)
     return chunks
 
-def parse_repomix_regex(xml_path: str, output_path: str = "code_chunks/chunks.jsonl"):
+def parse_repomix_regex(xml_path: str, output_path: str = "code_chunks/chunks.jsonl", store_path: str = STORE_DIR):
+    """Write the chunks as JSONL, and as a chunk store (src/adapters/chunk_store.py) for the embedder."""
     content = Path(xml_path).read_text(encoding="utf-8")
     pattern = r'<file path="([^"]+)">(.*?)</file>'
     matches = re.finditer(pattern, content, re.DOTALL)
     
     Path("code_chunks").mkdir(exist_ok=True)
+    store = ChunkStoreWriter(store_path)
     with open(output_path, "w", encoding="utf-8") as f:
         for i, match in enumerate(matches):
             path = match.group(1)
@@ -39,13 +73,14 @@ def parse_repomix_regex(xml_path: str, output_path: str = "code_chunks/chunks.js
             metadata = {"path": path, "type": "full_file"}
             
             if len(file_content) <= MAX_CHUNK_CHARS:
-                chunk = {
+                chunk = with_symbols({
                     "id": i,
                     "path": path,
                     "content": file_content,
                     "metadata": metadata
-                }
+                })
                 f.write(json.dumps(chunk) + "\n")
+                store.add(chunk)
             else:
                 print(f"[SPLITTING] {path} ({len(file_content)} chars)")
                 for j, sub in enumerate(split_large_file(path, file_content)):
@@ -54,13 +89,15 @@ def parse_repomix_regex(xml_path: str, output_path: str = "code_chunks/chunks.js
                         "lines": f"{sub['start_line']}–{sub['end_line']}",
                         "type": "file_fragment"
                     }
-                    chunk = {
+                    chunk = with_symbols({
                         "id": f"{i}_{j}",
                         "path": path,
                         "content": sub["content"],
                         "metadata": sub_metadata
-                    }
+                    })
                     f.write(json.dumps(chunk) + "\n")
+                    store.add(chunk)
+    print(f"Wrote {store.close()} chunks to {output_path} and {store_path}")
 
 
 if __name__ == '__main__':
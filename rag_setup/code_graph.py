@@ -0,0 +1,118 @@
+"""Build the chunk-level code graph for a collection (see src/adapters/code_graph.py).
+
+Edges come from the decompiled Java with a few regexes, no full parse:
+  - extends:    `extends` / `implements` clauses, to the chunks declaring the supertypes
+  - references: imports, `new X(...)` and other capitalized type names, to the declaring chunks
+  - calls:      `.name(...)` calls, to chunks declaring a method of that name, restricted to
+                the caller's own file and the types it references, so common names stay precise
+Names are resolved through imports first, then the caller's package, then by simple name when
+that is unambiguous enough.
+"""
+import re
+from collections import defaultdict
+from typing import Dict, List, Set, Tuple
+
+from src.adapters.code_graph import EDGE_KINDS, CodeGraph
+
+EXTENDS, REFERENCES, CALLS = (EDGE_KINDS.index(kind) for kind in ("extends", "references", "calls"))
+
+MAX_TARGETS_PER_NAME = 4  # Skip names declared in more chunks than this; they are too generic
+MAX_EDGES_PER_KIND = 32  # Per chunk, so one huge file cannot dominate the graph
+
+_PACKAGE = re.compile(r"^\s*package\s+([\w.]+)\s*;", re.MULTILINE)
+_IMPORT = re.compile(r"^\s*import\s+(?:static\s+)?([\w.]+?)(?:\.\*)?\s*;", re.MULTILINE)
+_TYPE_DECLARATION = re.compile(r"\b(?:class|interface|enum|record)\s+([A-Z]\w*)([^{;]*)\{")
+_GENERICS = re.compile(r"<[^<>]*>")
+_TYPE_NAME = re.compile(r"\b([A-Z][A-Za-z0-9_]*)\b")
+# Return type, then name(params) and an opening brace.
+_METHOD_DECLARATION = re.compile(
+    r"\b[\w.]+(?:<[^;{}()]*>)?(?:\[\])*\s+([a-z]\w*)\s*\([^)]*\)\s*(?:throws\s+[\w.,\s]+?)?\s*\{"
+)
+_CALL = re.compile(r"\.\s*([a-z]\w*)\s*\(")
+_KEYWORDS = {"if", "for", "while", "switch", "catch", "return", "new", "throw", "synchronized", "else", "do", "try"}
+
+
+def _supertypes(header: str) -> List[str]:
+    while _GENERICS.search(header):
+        header = _GENERICS.sub("", header)
+    names = []
+    for clause in re.findall(r"\b(?:extends|implements)\s+([\w.,\s]+)", header):
+        names.extend(name.split(".")[-1] for name in re.findall(r"[\w.]+", clause) if name not in ("extends", "implements"))
+    return names
+
+
+class _Symbols:
+    """Where every type and method is declared, by chunk index."""
+
+    def __init__(self, chunks: List[Dict]):
+        self.package_by_path: Dict[str, str] = {}
+        self.types_by_fqn: Dict[str, Set[int]] = defaultdict(set)
+        self.types_by_name: Dict[str, Set[int]] = defaultdict(set)
+        self.methods_by_name: Dict[str, Set[int]] = defaultdict(set)
+        self.declared_types: List[Set[str]] = []
+
+        for chunk in chunks:
+            match = _PACKAGE.search(chunk["content"])
+            if match:
+                self.package_by_path.setdefault(chunk["path"], match.group(1))
+
+        for i, chunk in enumerate(chunks):
+            package = self.package_by_path.get(chunk["path"], "")
+            declared = {match.group(1) for match in _TYPE_DECLARATION.finditer(chunk["content"])}
+            self.declared_types.append(declared)
+            for name in declared:
+                self.types_by_name[name].add(i)
+                self.types_by_fqn[f"{package}.{name}" if package else name].add(i)
+            for match in _METHOD_DECLARATION.finditer(chunk["content"]):
+                if match.group(1) not in _KEYWORDS:
+                    self.methods_by_name[match.group(1)].add(i)
+
+    def resolve_type(self, name: str, imports: Dict[str, str], package: str) -> Set[int]:
+        if name in imports:
+            return self.types_by_fqn.get(imports[name], set())
+        same_package = self.types_by_fqn.get(f"{package}.{name}" if package else name)
+        if same_package:
+            return same_package
+        candidates = self.types_by_name.get(name, set())
+        return candidates if len(candidates) <= MAX_TARGETS_PER_NAME else set()
+
+
+def _chunk_edges(i: int, chunk: Dict, symbols: _Symbols, chunks_by_path: Dict[str, Set[int]]) -> List[Tuple[int, int, int]]:
+    content = chunk["content"]
+    package = symbols.package_by_path.get(chunk["path"], "")
+    imports = {fqn.split(".")[-1]: fqn for fqn in _IMPORT.findall(content)}
+    declared = symbols.declared_types[i]
+    edges: Dict[int, List[Tuple[int, int, int]]] = defaultdict(list)
+
+    supertypes: Set[int] = set()
+    for match in _TYPE_DECLARATION.finditer(content):
+        for name in _supertypes(match.group(2)):
+            supertypes |= symbols.resolve_type(name, imports, package)
+    edges[EXTENDS].extend((i, t, EXTENDS) for t in sorted(supertypes))
+
+    referenced: Set[int] = set()
+    for name in set(_TYPE_NAME.findall(content)) - declared:
+        referenced |= symbols.resolve_type(name, imports, package)
+    edges[REFERENCES].extend((i, t, REFERENCES) for t in sorted(referenced - supertypes))
+
+    # A call can only land in this file or in a type the chunk already mentions.
+    reachable = referenced | chunks_by_path[chunk["path"]]
+    for name in set(_CALL.findall(content)):
+        targets = symbols.methods_by_name.get(name, set()) & reachable
+        if len(targets) <= MAX_TARGETS_PER_NAME:
+            edges[CALLS].extend((i, t, CALLS) for t in sorted(targets))
+
+    return [edge for kind_edges in edges.values() for edge in kind_edges[:MAX_EDGES_PER_KIND]]
+
+
+def build_code_graph(chunks: List[Dict]) -> CodeGraph:
+    """Graph over `chunks`, where chunk i is the point with id i."""
+    symbols = _Symbols(chunks)
+    chunks_by_path: Dict[str, Set[int]] = defaultdict(set)
+    for i, chunk in enumerate(chunks):
+        chunks_by_path[chunk["path"]].add(i)
+
+    edges = []
+    for i, chunk in enumerate(chunks):
+        edges.extend(_chunk_edges(i, chunk, symbols, chunks_by_path))
+    return CodeGraph.from_edges(len(chunks), edges)
@@ -0,0 +1,133 @@
+"""Drop identical and near-identical chunks before they are embedded.
+
+Decompiled sources contain many copies of the same code (generated packets, codecs,
+enum-like assets). Exact copies are found by hashing whitespace-normalized content;
+near copies by MinHash signatures over token shingles, bucketed with LSH and confirmed
+by the estimated Jaccard similarity. Each cluster keeps its first chunk, which records
+the other members' paths in `alias_paths`.
+"""
+import hashlib
+import re
+import zlib
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+SHINGLE_TOKENS = 5
+NUM_PERMUTATIONS = 128
+LSH_BANDS = 16  # 16 bands of 8 rows: pairs above ~0.7 Jaccard become candidates
+JACCARD_THRESHOLD = 0.9  # Estimated similarity needed to merge a candidate pair
+MIN_SHINGLES = 20  # Smaller chunks are only merged when exactly equal
+
+_PRIME = (1 << 31) - 1
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+class _UnionFind:
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, i: int) -> int:
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, a: int, b: int):
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            # The earlier chunk stays the root, so it becomes the representative.
+            self.parent[max(a, b)] = min(a, b)
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(" ".join(content.split()).encode("utf-8")).hexdigest()
+
+
+def shingles(content: str) -> np.ndarray:
+    tokens = _TOKEN_PATTERN.findall(content)
+    if len(tokens) < SHINGLE_TOKENS:
+        return np.zeros(0, dtype=np.uint64)
+    hashes = {
+        zlib.crc32(" ".join(tokens[i:i + SHINGLE_TOKENS]).encode("utf-8"))
+        for i in range(len(tokens) - SHINGLE_TOKENS + 1)
+    }
+    return np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+
+
+def minhash_signature(values: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    # (a * x + b) mod p for every permutation and shingle; x < 2^32 and a, b < p fit in uint64.
+    return ((np.outer(values, a) + b) % np.uint64(_PRIME)).min(axis=0)
+
+
+def find_clusters(chunks: Sequence[Dict], seed: int = 0) -> List[int]:
+    """Return, for every chunk, the index of the chunk representing its cluster."""
+    groups = _UnionFind(len(chunks))
+
+    first_by_hash: Dict[str, int] = {}
+    for i, chunk in enumerate(chunks):
+        digest = content_hash(chunk["content"])
+        if digest in first_by_hash:
+            groups.union(first_by_hash[digest], i)
+        else:
+            first_by_hash[digest] = i
+
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, _PRIME, size=NUM_PERMUTATIONS, dtype=np.uint64)
+    b = rng.integers(0, _PRIME, size=NUM_PERMUTATIONS, dtype=np.uint64)
+    signatures: Dict[int, np.ndarray] = {}
+    for i in first_by_hash.values():
+        values = shingles(chunks[i]["content"])
+        if len(values) >= MIN_SHINGLES:
+            signatures[i] = minhash_signature(values, a, b)
+
+    rows = NUM_PERMUTATIONS // LSH_BANDS
+    for band in range(LSH_BANDS):
+        buckets: Dict[bytes, int] = {}
+        for i, signature in signatures.items():
+            key = signature[band * rows:(band + 1) * rows].tobytes()
+            leader = buckets.setdefault(key, i)
+            # Comparing against the bucket's first member keeps large buckets linear;
+            # pairs missed here usually share another band.
+            if leader != i and np.mean(signatures[leader] == signature) >= JACCARD_THRESHOLD:
+                groups.union(leader, i)
+
+    return [groups.find(i) for i in range(len(chunks))]
+
+
+def deduplicate(chunks: Sequence[Dict]) -> Tuple[List[int], Dict[int, List[str]], Dict]:
+    """Keep one chunk per cluster.
+
+    Returns the indices of the kept chunks, the paths of the merged copies for each kept
+    chunk (its `alias_paths`), and statistics. Only indices are held, so `chunks` can be a
+    memory-mapped store.
+    """
+    representatives = find_clusters(chunks)
+    kept: List[int] = []
+    aliases: Dict[int, List[str]] = {}
+    exact = 0
+    chars_in = chars_out = 0
+    for i, rep in enumerate(representatives):
+        chunk = chunks[i]
+        chars_in += len(chunk["content"])
+        if rep == i:
+            kept.append(i)
+            aliases[i] = []
+            chars_out += len(chunk["content"])
+            continue
+        representative = chunks[rep]
+        if content_hash(chunk["content"]) == content_hash(representative["content"]):
+            exact += 1
+        if chunk["path"] != representative["path"] and chunk["path"] not in aliases[rep]:
+            aliases[rep].append(chunk["path"])
+
+    removed = len(chunks) - len(kept)
+    stats = {
+        "chunks_in": len(chunks),
+        "chunks_out": len(kept),
+        "exact_duplicates": exact,
+        "near_duplicates": removed - exact,
+        "chars_in": chars_in,
+        "chars_out": chars_out,
+    }
+    return kept, aliases, stats
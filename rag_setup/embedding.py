@@ -1,112 +1,232 @@
-import os
+import argparse
 import json
-import re
+import os
+import time
 from pathlib import Path
 from tqdm import tqdm
-from typing import Dict, List, Set
+from typing import Dict, Iterator, List, Optional
 from sentence_transformers import SentenceTransformer
+import numpy as np
 from qdrant_client import QdrantClient
 from qdrant_client.http.models import Distance, VectorParams
-from qdrant_client.models import PointStruct
-
-
-def extract_code_symbols(content: str) -> Dict[str, List[str]]:
-    class_names: Set[str] = set()
-    method_names: Set[str] = set()
-
-    for match in re.finditer(
-        r'(?:public|private|protected|abstract|final)?\s*(?:class|interface|enum|record)\s+([A-Za-z0-9_]+)',
-        content,
-    ):
-        class_names.add(match.group(1))
-
-    method_pattern = (
-        r'(?:public|private|protected|static|final|synchronized)?\s*'
-        r'(?:[\w<>\[\]]+\s+)?([a-zA-Z_][a-zA-Z0-9_]*)\s*\([^)]*\)\s*'
-        r'(?:throws\s+[\w, ]+)?\s*{'
-    )
-    for match in re.finditer(method_pattern, content):
-        method_names.add(match.group(1))
-
-    return {
-        "class_names": list(class_names),
-        "method_names": list(method_names),
-    }
+from qdrant_client.models import OptimizersConfigDiff, PointStruct
+
+from src.adapters.chunk_store import ChunkStore, chunk_store_path, write_chunk_store
+from src.adapters.code_graph import graph_path
+from src.config import COLLECTION_NAME, EMBEDDING_MODEL_NAME, QDRANT_URL, COLLECTION_VERSIONS_KEPT
+from rag_setup.chunking import STORE_DIR, with_symbols
+from rag_setup.code_graph import build_code_graph
+from rag_setup.dedup import deduplicate
+from rag_setup.index_versions import (
+    BUILD_ID_FORMAT,
+    current_version,
+    delete_version,
+    garbage_collect,
+    is_build_id,
+    new_version_name,
+    is_plain_collection,
+    promote,
+    smoke_test,
+    wait_until_indexed,
+)
 
 
 CHUNKS_FILE = "code_chunks/chunks.jsonl"
-COLLECTION_NAME = "hytale_codebase"
-MODEL_NAME = "mixedbread-ai/mxbai-embed-large-v1"
 BATCH_SIZE = 2
-QDRANT_URL = os.getenv("QDRANT_URL")
-
-
-print(f"Loading chunks from {CHUNKS_FILE}...")
-chunks = []
-with open(CHUNKS_FILE, "r", encoding="utf-8") as f:
-    for line in f:
-        if line.strip():
-            chunks.append(json.loads(line))
-
-print(f"Loaded {len(chunks)} chunks.")
-
-print(f"Loading embedding model: {MODEL_NAME}")
-model = SentenceTransformer(MODEL_NAME)
-
-texts = []
-for chunk in chunks:
+ENCODE_BLOCK = 2048  # Chunks read from the store and encoded at a time
+UPLOAD_BATCH_SIZE = 256
+SMOKE_QUERIES = [
+    "How is a player connection handled?",
+    "Where are blocks placed in the world?",
+    "How are entity components registered?",
+    "How does the server load plugins?",
+]
+
+
+def iter_jsonl_chunks(path: str) -> Iterator[Dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                chunk = json.loads(line)
+                yield chunk if "class_names" in chunk else with_symbols(chunk)
+
+
+def open_chunks(store_dir: str, jsonl_path: str) -> ChunkStore:
+    """Map the chunker's store, converting a chunks JSONL from an older chunker run if needed."""
+    if not os.path.exists(os.path.join(store_dir, "meta.json")):
+        print(f"No chunk store at {store_dir}; converting {jsonl_path}...")
+        write_chunk_store(iter_jsonl_chunks(jsonl_path), store_dir)
+    return ChunkStore(store_dir)
+
+
+def encode_store(model, store: ChunkStore, batch_size: int) -> np.ndarray:
+    """Embed every chunk, reading ENCODE_BLOCK texts at a time from the mapped store."""
+    blocks = []
+    with tqdm(total=len(store), unit="chunk") as progress:
+        for start in range(0, len(store), ENCODE_BLOCK):
+            texts = [chunk_text(store[row]) for row in range(start, min(start + ENCODE_BLOCK, len(store)))]
+            blocks.append(model.encode(texts, batch_size=batch_size, normalize_embeddings=True).astype(np.float32))
+            progress.update(len(texts))
+    return np.concatenate(blocks) if blocks else np.zeros((0, model.get_sentence_embedding_dimension()), np.float32)
+
+
+def chunk_text(chunk: Dict) -> str:
     metadata = chunk.get("metadata", {})
     lines_info = metadata.get("lines", "full file")
-    text = f"File path: {chunk['path']}\nLines: {lines_info}\n\n{chunk['content']}"
-    texts.append(text)
-
-print("Computing embeddings...")
-embeddings = model.encode(
-    texts,
-    batch_size=BATCH_SIZE,
-    show_progress_bar=True,
-    normalize_embeddings=True,
-)
-
-dimension = embeddings.shape[1]
-print(f"Embeddings shape: {embeddings.shape} (dimension: {dimension})")
-
-print(f"Connecting to Qdrant at {QDRANT_URL}")
-client = QdrantClient(url=QDRANT_URL)
+    return f"File path: {chunk['path']}\nLines: {lines_info}\n\n{chunk['content']}"
+
+
+def iter_points(store: ChunkStore, embeddings, vectors_only: bool = False) -> Iterator[PointStruct]:
+    # Point id = store row, so the retriever can look chunks up in the store by id.
+    for row, vector in enumerate(embeddings):
+        yield PointStruct(id=row, vector=vector.tolist(), payload=None if vectors_only else store[row])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embed chunks into a new versioned collection and promote it")
+    parser.add_argument("--store", default=STORE_DIR, help="Chunk store produced by chunking.py")
+    parser.add_argument("--chunks", default=CHUNKS_FILE, help="Chunks JSONL, converted when there is no store yet")
+    parser.add_argument("--build-id", default=None, help=f"Version suffix, a UTC timestamp as {BUILD_ID_FORMAT} (default: now)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Embedding batch size")
+    parser.add_argument("--upload-batch-size", type=int, default=UPLOAD_BATCH_SIZE, help="Points per upsert request")
+    parser.add_argument("--parallel", type=int, default=2, help="Parallel upload workers")
+    parser.add_argument("--smoke-queries", default=None, help="Optional file with one smoke query per line")
+    parser.add_argument("--min-smoke-score", type=float, default=0.3, help="Minimum best-hit score for each smoke query")
+    parser.add_argument("--keep", type=int, default=COLLECTION_VERSIONS_KEPT, help="Versions to keep after promotion, including the live one")
+    parser.add_argument("--no-promote", action="store_true", help="Build and validate only; leave the alias alone")
+    parser.add_argument(
+        "--replace-plain-collection", action="store_true",
+        help=f"Migration: if '{COLLECTION_NAME}' is a real collection, delete it and create the alias in its place on promotion",
+    )
+    parser.add_argument("--no-dedup", action="store_true", help="Embed every chunk, even exact and near duplicates")
+    parser.add_argument("--no-code-graph", action="store_true", help="Skip building the code graph used for context expansion")
+    parser.add_argument(
+        "--vectors-only", action="store_true",
+        help="Upload no payloads; the retriever then needs this build's chunk store (CHUNK_STORE_DIR)",
+    )
+    args = parser.parse_args()
+    if args.build_id is not None and not is_build_id(args.build_id):
+        # Versions are ordered by build id, so garbage collection must be able to trust it.
+        parser.error(f"--build-id must be a UTC timestamp in {BUILD_ID_FORMAT} format, e.g. 20260301120000")
+
+    print(f"Connecting to Qdrant at {QDRANT_URL}")
+    client = QdrantClient(url=QDRANT_URL)
+    # Fail before the build, not after an hour of embedding, when promotion could not succeed.
+    if not args.no_promote and not args.replace_plain_collection and is_plain_collection(client):
+        raise SystemExit(
+            f"'{COLLECTION_NAME}' is a real collection, not an alias, so the new version cannot be promoted. "
+            f"Rerun with --replace-plain-collection to swap it for the alias once the build passes its smoke "
+            f"test, or with --no-promote to only build."
+        )
 
-print(f"Creating/recreating collection '{COLLECTION_NAME}'")
-client.recreate_collection(
-    collection_name=COLLECTION_NAME,
-    vectors_config=VectorParams(size=dimension, distance=Distance.COSINE),
-)
+    source = open_chunks(args.store, args.chunks)
+    print(f"Mapped {len(source)} chunks from {args.store}.")
+
+    rows: List[int] = list(range(len(source)))
+    aliases: Dict[int, List[str]] = {}
+    dedup_stats: Optional[Dict] = None
+    if not args.no_dedup:
+        started = time.perf_counter()
+        rows, aliases, dedup_stats = deduplicate(source)
+        print(
+            f"Deduplicated in {time.perf_counter() - started:.1f}s: {dedup_stats['chunks_in']} -> "
+            f"{dedup_stats['chunks_out']} chunks ({dedup_stats['exact_duplicates']} exact, "
+            f"{dedup_stats['near_duplicates']} near duplicates)"
+        )
 
-print("Upserting vectors to Qdrant...")
-batch_size = 100
-points = []
-
-for i, (chunk, vector) in tqdm(enumerate(zip(chunks, embeddings)), total=len(chunks)):
-    symbols = extract_code_symbols(chunk["content"])
-
-    points.append(
-        PointStruct(
-            id=i,
-            vector=vector.tolist(),
-            payload={
-                "path": chunk["path"],
-                "content": chunk["content"],
-                "metadata": chunk.get("metadata", {}),
-                "class_names": symbols["class_names"],
-                "method_names": symbols["method_names"],
-            },
+    # A new collection every build: the live one keeps serving until the alias swap.
+    # Its chunk store holds the kept chunks in point-id order.
+    collection = new_version_name(args.build_id)
+    write_chunk_store((dict(source[row], alias_paths=aliases.get(row, [])) for row in rows), chunk_store_path(collection))
+    store = ChunkStore(chunk_store_path(collection))
+    print(f"Wrote chunk store for '{collection}' to {chunk_store_path(collection)}")
+
+    print(f"Loading embedding model: {EMBEDDING_MODEL_NAME}")
+    model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+
+    print("Computing embeddings...")
+    started = time.perf_counter()
+    embeddings = encode_store(model, store, args.batch_size)
+    embedding_seconds = time.perf_counter() - started
+    print(f"Embedded {len(store)} chunks in {embedding_seconds:.1f}s")
+
+    dimension = embeddings.shape[1]
+    print(f"Embeddings shape: {embeddings.shape} (dimension: {dimension})")
+    if dedup_stats:
+        removed = dedup_stats["chunks_in"] - dedup_stats["chunks_out"]
+        removed_chars = dedup_stats["chars_in"] - dedup_stats["chars_out"]
+        # Estimates: embedding time scales with text length, vectors are float32.
+        saved_seconds = embedding_seconds * removed_chars / max(1, dedup_stats["chars_out"])
+        saved_mb = (removed * dimension * 4 + removed_chars) / 1e6
+        print(
+            f"Dedup saved ~{saved_seconds:.0f}s of embedding and ~{saved_mb:.1f} MB of vectors and "
+            f"payload ({removed} points, {100 * removed / max(1, dedup_stats['chunks_in']):.1f}% of the index)"
         )
-    )
 
-    if len(points) >= batch_size:
-        client.upsert(collection_name=COLLECTION_NAME, points=points)
-        points = []
+    print(f"Creating collection '{collection}' (live: {current_version(client) or 'none'})")
+    client.create_collection(
+        collection_name=collection,
+        vectors_config=VectorParams(size=dimension, distance=Distance.COSINE),
+        # Index once after the bulk upload instead of continuously during it.
+        optimizers_config=OptimizersConfigDiff(indexing_threshold=0),
+    )
 
-if points:
-    client.upsert(collection_name=COLLECTION_NAME, points=points)
+    print("Uploading vectors to Qdrant...")
+    client.upload_points(
+        collection_name=collection,
+        points=tqdm(iter_points(store, embeddings, args.vectors_only), total=len(store)),
+        batch_size=args.upload_batch_size,
+        parallel=args.parallel,
+        wait=True,
+    )
+    client.update_collection(
+        collection_name=collection,
+        optimizer_config=OptimizersConfigDiff(indexing_threshold=20000),
+    )
+    if not args.no_code_graph:
+        # Node ids are store rows, i.e. point ids.
+        started = time.perf_counter()
+        graph = build_code_graph(store)
+        graph.save(graph_path(collection))
+        print(
+            f"Code graph: {graph.num_edges} edges over {graph.num_nodes} chunks in "
+            f"{time.perf_counter() - started:.1f}s, saved to {graph_path(collection)}"
+        )
 
-print(f"Done! {len(chunks)} vectors stored in collection '{COLLECTION_NAME}'.")
-print("You can now query it in your retrieval script.")
\ No newline at end of file
+    print("Waiting for indexing to finish...")
+    wait_until_indexed(client, collection)
+
+    queries = SMOKE_QUERIES
+    if args.smoke_queries:
+        queries = [line.strip() for line in Path(args.smoke_queries).read_text(encoding="utf-8").splitlines() if line.strip()]
+    problems = smoke_test(
+        client,
+        collection,
+        lambda texts: model.encode(texts, normalize_embeddings=True),
+        queries,
+        expected_points=len(store),
+        min_score=args.min_smoke_score,
+    )
+    if problems:
+        print(f"Smoke test failed for '{collection}'; the alias was not changed:")
+        for problem in problems:
+            print(f"  - {problem}")
+        delete_version(client, collection)
+        print(f"Deleted '{collection}' with its chunk store and code graph.")
+        raise SystemExit(1)
+    print(f"Smoke test passed ({len(queries)} queries).")
+
+    if args.no_promote:
+        print(f"Done! '{collection}' is built but not live (--no-promote).")
+        return
+
+    previous = promote(client, collection, replace_plain_collection=args.replace_plain_collection)
+    print(f"Alias '{COLLECTION_NAME}' now points to '{collection}' (was: {previous or 'none'}).")
+    deleted = garbage_collect(client, keep=args.keep)
+    if deleted:
+        print(f"Deleted old versions: {', '.join(deleted)}")
+    print(f"Done! {len(store)} vectors stored in collection '{collection}'.")
+
+
+if __name__ == "__main__":
+    main()
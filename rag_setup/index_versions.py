@@ -0,0 +1,148 @@
+"""Versioned collections behind a Qdrant alias (blue/green index rebuilds).
+
+Each build writes a fresh `<COLLECTION_NAME>_<build-id>` collection while the live one
+keeps serving. Once it passes a smoke test, the `COLLECTION_NAME` alias the retriever
+queries is swapped to it in one atomic alias update, and old versions are deleted.
+"""
+import datetime
+import os
+import shutil
+import time
+from typing import Callable, List, Optional
+
+from qdrant_client import QdrantClient, models
+
+from src.adapters.chunk_store import chunk_store_path
+from src.adapters.code_graph import graph_path
+from src.config import COLLECTION_NAME
+
+
+BUILD_ID_FORMAT = "%Y%m%d%H%M%S"  # UTC build time, so version names sort chronologically
+
+
+def is_build_id(build_id: str) -> bool:
+    if len(build_id) != 14 or not build_id.isdigit():
+        return False
+    try:
+        datetime.datetime.strptime(build_id, BUILD_ID_FORMAT)
+    except ValueError:
+        return False
+    return True
+
+
+def new_version_name(build_id: Optional[str] = None) -> str:
+    build_id = build_id or datetime.datetime.utcnow().strftime(BUILD_ID_FORMAT)
+    if not is_build_id(build_id):
+        raise ValueError(f"Build id {build_id!r} is not a UTC timestamp in {BUILD_ID_FORMAT} format")
+    return f"{COLLECTION_NAME}_{build_id}"
+
+
+def is_version(name: Optional[str]) -> bool:
+    """True for a versioned collection name, as opposed to the plain COLLECTION_NAME."""
+    prefix = f"{COLLECTION_NAME}_"
+    return bool(name) and name.startswith(prefix) and is_build_id(name[len(prefix):])
+
+
+def list_versions(client: QdrantClient) -> List[str]:
+    """Versioned collections, oldest first (their build ids are timestamps).
+
+    Collections that only share the prefix are not versions and are never listed, so
+    garbage_collect() leaves them alone.
+    """
+    return sorted(c.name for c in client.get_collections().collections if is_version(c.name))
+
+
+def current_version(client: QdrantClient) -> Optional[str]:
+    for alias in client.get_aliases().aliases:
+        if alias.alias_name == COLLECTION_NAME:
+            return alias.collection_name
+    return None
+
+
+def wait_until_indexed(client: QdrantClient, collection: str, timeout: float = 1800.0):
+    deadline = time.monotonic() + timeout
+    while client.get_collection(collection).status != models.CollectionStatus.GREEN:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Collection '{collection}' did not finish indexing in {timeout:.0f}s")
+        time.sleep(2)
+
+
+def smoke_test(
+    client: QdrantClient,
+    collection: str,
+    encode: Callable[[List[str]], "list"],
+    queries: List[str],
+    expected_points: int,
+    min_score: float,
+) -> List[str]:
+    """Return a list of problems; empty means the collection is safe to promote."""
+    problems = []
+    points = client.count(collection_name=collection, exact=True).count
+    if points != expected_points:
+        problems.append(f"expected {expected_points} points, found {points}")
+
+    for query, vector in zip(queries, encode(queries)):
+        hits = client.query_points(collection_name=collection, query=vector.tolist(), limit=1).points
+        if not hits:
+            problems.append(f"no hits for smoke query {query!r}")
+        elif hits[0].score < min_score:
+            problems.append(f"best score {hits[0].score:.3f} < {min_score} for smoke query {query!r}")
+    return problems
+
+
+def is_plain_collection(client: QdrantClient) -> bool:
+    """True when COLLECTION_NAME is a real collection (as restored by older imports), not an alias."""
+    return current_version(client) is None and client.collection_exists(COLLECTION_NAME)
+
+
+def promote(client: QdrantClient, collection: str, replace_plain_collection: bool = False) -> Optional[str]:
+    """Point the COLLECTION_NAME alias at `collection` atomically; return the previous target.
+
+    A plain COLLECTION_NAME collection blocks the alias name. With `replace_plain_collection`
+    it is deleted and the alias created right after it, so readers only miss the index for
+    the moment between the two requests; otherwise this raises before touching anything.
+    """
+    if not is_version(collection):
+        raise ValueError(f"Only versioned collections can be promoted, not '{collection}'.")
+    if is_plain_collection(client):
+        if not replace_plain_collection:
+            raise ValueError(
+                f"'{COLLECTION_NAME}' is a real collection, not an alias. Pass --replace-plain-collection "
+                f"to replace it with the alias in one step."
+            )
+        client.delete_collection(collection_name=COLLECTION_NAME)
+        client.update_collection_aliases(change_aliases_operations=[models.CreateAliasOperation(
+            create_alias=models.CreateAlias(collection_name=collection, alias_name=COLLECTION_NAME)
+        )])
+        return COLLECTION_NAME
+
+    previous = current_version(client)
+    operations = []
+    if previous is not None:
+        operations.append(models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name=COLLECTION_NAME)))
+    operations.append(models.CreateAliasOperation(
+        create_alias=models.CreateAlias(collection_name=collection, alias_name=COLLECTION_NAME)
+    ))
+    # Both operations are applied in one request, so readers never see the alias missing.
+    client.update_collection_aliases(change_aliases_operations=operations)
+    return previous
+
+
+def garbage_collect(client: QdrantClient, keep: int) -> List[str]:
+    """Delete all but the newest `keep` versions, with their code graphs and chunk stores. The live version is never deleted."""
+    live = current_version(client)
+    versions = list_versions(client)
+    stale = [v for v in versions[:max(0, len(versions) - keep)] if v != live]
+    for name in stale:
+        delete_version(client, name)
+    return stale
+
+
+def delete_version(client: QdrantClient, name: str):
+    """Delete a version's collection, code graph and chunk store. Refuses the live version."""
+    if name == current_version(client):
+        raise ValueError(f"'{name}' is the live version behind '{COLLECTION_NAME}'")
+    client.delete_collection(collection_name=name)
+    if os.path.exists(graph_path(name)):
+        os.remove(graph_path(name))
+    shutil.rmtree(chunk_store_path(name), ignore_errors=True)
@@ -0,0 +1,132 @@
+"""Snapshot files for moving an index version between Qdrant servers.
+
+scripts/qdrant_export.py writes, into SNAPSHOT_DIR:
+  <name>.snapshot     the Qdrant collection snapshot
+  <name>.extras.tar   the version's chunk store and code graph, when it has them
+  <name>.json         manifest: collection, sizes and SHA-256 checksums
+scripts/qdrant_import.py restores the newest one. Everything is read and written in
+BLOCK_BYTES pieces, so memory use does not depend on the snapshot size.
+"""
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import tarfile
+from typing import Dict, Iterable, Optional
+
+from src.adapters.chunk_store import chunk_store_path
+from src.adapters.code_graph import graph_path
+
+BLOCK_BYTES = 1 << 20
+SNAPSHOT_SUFFIX = ".snapshot"
+
+
+def sha256_file(path: str, digest=None):
+    """SHA-256 of a file read in blocks, continuing `digest` when given."""
+    digest = digest or hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(BLOCK_BYTES), b""):
+            digest.update(block)
+    return digest
+
+
+def verify_checksum(path: str, expected: str):
+    actual = sha256_file(path).hexdigest()
+    if actual != expected:
+        raise ValueError(f"Checksum mismatch for {path}: expected {expected}, got {actual}")
+
+
+def _base(snapshot_path: str) -> str:
+    return snapshot_path[:-len(SNAPSHOT_SUFFIX)] if snapshot_path.endswith(SNAPSHOT_SUFFIX) else snapshot_path
+
+
+def manifest_path(snapshot_path: str) -> str:
+    return _base(snapshot_path) + ".json"
+
+
+def extras_path(snapshot_path: str) -> str:
+    return _base(snapshot_path) + ".extras.tar"
+
+
+def write_manifest(snapshot_path: str, manifest: Dict):
+    manifest = dict(manifest, created_at=datetime.datetime.utcnow().isoformat() + "Z")
+    tmp = manifest_path(snapshot_path) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, manifest_path(snapshot_path))
+
+
+def read_manifest(snapshot_path: str) -> Optional[Dict]:
+    """The export's manifest, or None for a snapshot copied in by hand."""
+    path = manifest_path(snapshot_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def latest_snapshot(directory: str) -> Optional[str]:
+    """Newest complete snapshot in `directory`, by export time, else by modification time."""
+    if not os.path.isdir(directory):
+        return None
+    candidates = [
+        os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(SNAPSHOT_SUFFIX)
+    ]
+
+    def created(path: str):
+        manifest = read_manifest(path) or {}
+        return manifest.get("created_at") or datetime.datetime.utcfromtimestamp(os.path.getmtime(path)).isoformat() + "Z"
+
+    return max(candidates, key=created, default=None)
+
+
+def pack_extras(collection: str, path: str) -> bool:
+    """Write the chunk store and code graph of `collection` to a tar; False when it has neither."""
+    members = [
+        (chunk_store_path(collection), f"chunk_store/{collection}"),
+        (graph_path(collection), f"code_graph/{collection}.npz"),
+    ]
+    members = [(source, name) for source, name in members if os.path.exists(source)]
+    if not members:
+        return False
+    with tarfile.open(path + ".tmp", "w") as tar:
+        for source, name in members:
+            tar.add(source, arcname=name)
+    os.replace(path + ".tmp", path)
+    return True
+
+
+def _safe_members(tar: tarfile.TarFile, collection: str) -> Iterable[tarfile.TarInfo]:
+    allowed = (f"chunk_store/{collection}", f"code_graph/{collection}.npz")
+    for member in tar.getmembers():
+        name = os.path.normpath(member.name)
+        if not (member.isfile() or member.isdir()) or not any(name == a or name.startswith(a + os.sep) for a in allowed):
+            raise ValueError(f"Unexpected entry in extras archive: {member.name}")
+        yield member
+
+
+def unpack_extras(path: str, collection: str, source_collection: Optional[str] = None):
+    """Install the chunk store and code graph from an extras tar for `collection`.
+
+    The tar names its entries after the exported collection; pass `source_collection` when
+    that differs from `collection`. Entries are unpacked next to the tar first and moved into
+    place afterwards, so a failed import never leaves a half-written store where the
+    retriever would pick it up.
+    """
+    source_collection = source_collection or collection
+    staging = path + ".unpacked"
+    shutil.rmtree(staging, ignore_errors=True)
+    with tarfile.open(path) as tar:
+        tar.extractall(staging, members=list(_safe_members(tar, source_collection)))
+    for source, target in (
+        (os.path.join(staging, "chunk_store", source_collection), chunk_store_path(collection)),
+        (os.path.join(staging, "code_graph", f"{source_collection}.npz"), graph_path(collection)),
+    ):
+        if not os.path.exists(source):
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        shutil.move(source, target)
+    shutil.rmtree(staging, ignore_errors=True)
@@ -0,0 +1,271 @@
+"""Report on data/usage_metrics.jsonl through an incrementally updated SQLite index.
+
+Every run appends only the lines added since the last run (the byte offset is stored in the
+index), streaming them in batches, so memory stays bounded and reruns on a large file take
+seconds. The full event is kept as JSON next to the indexed columns, so ad-hoc questions can
+be answered with `sqlite3 data/usage_metrics.sqlite` and json_extract() on `event_details`.
+
+Examples:
+    python -m scripts.metrics_report                      # everything
+    python -m scripts.metrics_report --since 7d           # last week
+    python -m scripts.metrics_report --since 2026-10-01 --until 2026-10-08
+"""
+import argparse
+import datetime
+import hashlib
+import io
+import json
+import math
+import os
+import re
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+
+from src.config import METRICS_FILE, METRICS_INDEX_FILE
+
+INSERT_BATCH = 5000
+PERCENTILES = (50, 90, 95, 99)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,  -- Byte offset of the line in the JSONL file
+    ts REAL NOT NULL,
+    day TEXT NOT NULL,
+    event TEXT NOT NULL,
+    command TEXT,
+    success INTEGER,
+    duration REAL,
+    query_chars INTEGER,
+    response_chunks INTEGER,
+    history_trimmed INTEGER,
+    new_conversation INTEGER,
+    reason TEXT
+);
+CREATE INDEX IF NOT EXISTS events_by_event_ts ON events (event, ts);
+-- Kept apart so scans of the narrow events table stay fast.
+CREATE TABLE IF NOT EXISTS event_details (id INTEGER PRIMARY KEY, json TEXT NOT NULL);
+"""
+
+
+def _fingerprint(path: str) -> str:
+    """Hash of the first line, to notice when the file was replaced rather than appended to."""
+    if not os.path.exists(path):
+        return hashlib.sha256(b"").hexdigest()  # Same as an empty file
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.readline()).hexdigest()
+
+
+def _get_meta(db: sqlite3.Connection, key: str) -> Optional[str]:
+    row = db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def _set_meta(db: sqlite3.Connection, key: str, value):
+    db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+
+def _bool(value) -> Optional[int]:
+    return None if value is None else int(bool(value))
+
+
+def _row(offset: int, line: bytes) -> Optional[Tuple]:
+    try:
+        metric = json.loads(line)
+        stamp = datetime.datetime.fromisoformat(metric["timestamp"].rstrip("Z")).replace(tzinfo=datetime.timezone.utc)
+    except (ValueError, KeyError, TypeError):
+        return None
+    return (
+        offset,
+        stamp.timestamp(),
+        stamp.strftime("%Y-%m-%d"),
+        metric.get("event", ""),
+        metric.get("command"),
+        _bool(metric.get("success")),
+        metric.get("duration_seconds"),
+        metric.get("query_char_count"),
+        metric.get("response_chunks"),
+        _bool(metric.get("history_trimmed")),
+        _bool(metric.get("new_conversation")),
+        metric.get("reason") or metric.get("error_reason"),
+    )
+
+
+def _insert(db: sqlite3.Connection, rows: List[Tuple], lines: List[Tuple]):
+    db.executemany("INSERT INTO events VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    db.executemany("INSERT INTO event_details VALUES (?, ?)", lines)
+
+
+def update_index(db: sqlite3.Connection, path: str, rebuild: bool = False) -> int:
+    """Index the lines appended to `path` since the last run; return how many were added.
+
+    A missing file reads as an empty one (the bot has not logged anything yet, or the file
+    was removed), so the index is emptied rather than left describing a file that is gone.
+    """
+    db.executescript(SCHEMA)
+    offset = int(_get_meta(db, "offset") or 0)
+    fingerprint = _fingerprint(path)
+    size = os.path.getsize(path) if os.path.exists(path) else 0
+    if rebuild or _get_meta(db, "source") != os.path.abspath(path) or _get_meta(db, "fingerprint") != fingerprint \
+            or size < offset:
+        db.execute("DELETE FROM events")
+        db.execute("DELETE FROM event_details")
+        offset = 0
+
+    added = 0
+    rows: List[Tuple] = []
+    lines: List[Tuple] = []
+    with open(path, "rb") if size else io.BytesIO() as f:  # No file: nothing to read
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                break  # Still being written; picked up next time
+            row = _row(offset, line)
+            if row is not None:
+                rows.append(row)
+                lines.append((offset, line.decode("utf-8", errors="replace").strip()))
+            offset += len(line)
+            if len(rows) >= INSERT_BATCH:
+                _insert(db, rows, lines)
+                added += len(rows)
+                rows, lines = [], []
+    _insert(db, rows, lines)
+    added += len(rows)
+
+    _set_meta(db, "source", os.path.abspath(path))
+    _set_meta(db, "fingerprint", fingerprint)
+    _set_meta(db, "offset", offset)
+    db.commit()
+    return added
+
+
+def parse_time(value: Optional[str]) -> Optional[float]:
+    """Epoch seconds for an ISO date/time (UTC) or a relative age like 36h, 7d, 4w."""
+    if not value:
+        return None
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)([hdw])", value)
+    if match:
+        hours = float(match.group(1)) * {"h": 1, "d": 24, "w": 168}[match.group(2)]
+        return (datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=hours)).timestamp()
+    stamp = datetime.datetime.fromisoformat(value.rstrip("Z"))
+    if stamp.tzinfo is None:
+        stamp = stamp.replace(tzinfo=datetime.timezone.utc)
+    return stamp.timestamp()
+
+
+class Window:
+    """SQL filter for one command's events between two times."""
+
+    def __init__(self, command: str, since: Optional[float], until: Optional[float]):
+        self.sql = "event = 'command_invocation' AND command = ?"
+        self.params: List = [command]
+        if since is not None:
+            self.sql += " AND ts >= ?"
+            self.params.append(since)
+        if until is not None:
+            self.sql += " AND ts < ?"
+            self.params.append(until)
+
+    def where(self, extra: str = "") -> str:
+        return f"WHERE {self.sql}{' AND ' + extra if extra else ''}"
+
+
+def percentiles(db: sqlite3.Connection, window: Window, extra: str = "") -> Dict[int, Optional[float]]:
+    """Nearest-rank percentiles of `duration`, picked in one sorted pass inside SQLite."""
+    where = window.where("duration IS NOT NULL" + (f" AND {extra}" if extra else ""))
+    count = db.execute(f"SELECT COUNT(*) FROM events {where}", window.params).fetchone()[0]
+    if not count:
+        return {p: None for p in PERCENTILES}
+    ranks = {p: max(1, math.ceil(p / 100 * count)) for p in PERCENTILES}
+    values = dict(db.execute(
+        f"SELECT rank, duration FROM (SELECT duration, ROW_NUMBER() OVER (ORDER BY duration) AS rank "
+        f"FROM events {where}) WHERE rank IN ({', '.join('?' * len(ranks))})",
+        window.params + list(ranks.values()),
+    ))
+    return {p: values[rank] for p, rank in ranks.items()}
+
+
+def correlation(db: sqlite3.Connection, window: Window, column: str, extra: str = "") -> Tuple[int, Optional[float]]:
+    """Pearson correlation between `column` and duration, from running sums."""
+    where = window.where(f"{column} IS NOT NULL AND duration IS NOT NULL" + (f" AND {extra}" if extra else ""))
+    n, sx, sy, sxy, sxx, syy = db.execute(
+        f"SELECT COUNT(*), SUM({column}), SUM(duration), SUM({column} * duration), "
+        f"SUM({column} * {column}), SUM(duration * duration) FROM events {where}",
+        window.params,
+    ).fetchone()
+    if n < 2:
+        return n, None
+    denominator = ((n * sxx - sx * sx) * (n * syy - sy * sy)) ** 0.5
+    return n, ((n * sxy - sx * sy) / denominator) if denominator else None
+
+
+def _seconds(value: Optional[float]) -> str:
+    return f"{value:.2f}s" if value is not None else "-"
+
+
+def print_report(db: sqlite3.Connection, since: Optional[float], until: Optional[float]):
+    window = Window("hy", since, until)
+    total, succeeded = db.execute(
+        f"SELECT COUNT(*), COALESCE(SUM(success), 0) FROM events {window.where()}", window.params
+    ).fetchone()
+    if not total:
+        print("No !hy invocations in this window.")
+        return
+
+    print(f"!hy invocations: {total}, success rate {100 * succeeded / total:.1f}%")
+    for label, extra in (("all", ""), ("successful", "success = 1")):
+        values = percentiles(db, window, extra)
+        print(f"  duration ({label:<10}) " + "  ".join(f"p{p} {_seconds(v)}" for p, v in values.items()))
+
+    print("\nFailures by reason:")
+    for reason, count in db.execute(
+        f"SELECT COALESCE(reason, 'unknown'), COUNT(*) FROM events {window.where('success = 0')} "
+        f"GROUP BY 1 ORDER BY 2 DESC", window.params
+    ):
+        print(f"  {reason:<24} {count}")
+
+    print("\nResponse chunks (successful answers):")
+    for chunks, count in db.execute(
+        f"SELECT response_chunks, COUNT(*) FROM events {window.where('response_chunks IS NOT NULL')} "
+        f"GROUP BY 1 ORDER BY 1", window.params
+    ):
+        print(f"  {chunks:>3} chunk(s) {count:>7}  {100 * count / max(1, succeeded):5.1f}%")
+
+    print("\nDuration vs. query length and history trimming:")
+    n, r = correlation(db, window, "query_chars", "success = 1")
+    print(f"  Pearson r(query chars, duration) = {r:.3f} over {n} answers" if r is not None else "  not enough data")
+    for trimmed in (0, 1):
+        values = percentiles(db, window, f"success = 1 AND history_trimmed = {trimmed}")
+        label = "trimmed history" if trimmed else "untrimmed history"
+        print(f"  {label:<18} p50 {_seconds(values[50])}  p95 {_seconds(values[95])}")
+
+    print("\nPer day:")
+    print(f"  {'day':<10} {'count':>7} {'success':>8} {'avg':>8}")
+    for day, count, success, average in db.execute(
+        f"SELECT day, COUNT(*), COALESCE(SUM(success), 0), AVG(duration) FROM events {window.where()} "
+        f"GROUP BY day ORDER BY day", window.params
+    ):
+        print(f"  {day:<10} {count:>7} {100 * success / count:>7.1f}% {_seconds(average):>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency, success and volume report from the usage metrics")
+    parser.add_argument("--file", default=METRICS_FILE, help="Metrics JSONL written by the bot")
+    parser.add_argument("--index", default=METRICS_INDEX_FILE, help="SQLite index, updated incrementally")
+    parser.add_argument("--since", default=None, help="Start of the window: ISO date/time (UTC) or age like 24h, 7d")
+    parser.add_argument("--until", default=None, help="End of the window (exclusive), same formats")
+    parser.add_argument("--rebuild", action="store_true", help="Re-index the whole file")
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(args.index) or ".", exist_ok=True)
+    db = sqlite3.connect(args.index)
+    try:
+        added = update_index(db, args.file, rebuild=args.rebuild)
+        print(f"Indexed {added} new events from {args.file}\n")
+        print_report(db, parse_time(args.since), parse_time(args.until))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,125 @@
-from qdrant_client import QdrantClient
+"""Snapshot the live index version and download it to SNAPSHOT_DIR (see rag_setup/snapshots.py).
+
+The download is streamed to `<name>.snapshot.part` and resumed with HTTP range requests
+after a dropped connection, within the run or on the next run while the server still has
+that snapshot. The file is checked against the server's SHA-256 before it is renamed into
+place, and the chunk store and code graph of the version are packed next to it.
+
+    python -m scripts.qdrant_export                  # the version behind the alias
+    python -m scripts.qdrant_export --collection hytale_codebase_20260301120000
+"""
+import argparse
+import hashlib
 import os
+import time
+from typing import Optional
+
+import httpx
+from qdrant_client import QdrantClient
+from tqdm import tqdm
+
+from src.config import COLLECTION_NAME, QDRANT_URL, SNAPSHOT_DIR
+from rag_setup.index_versions import current_version
+from rag_setup.snapshots import (
+    BLOCK_BYTES,
+    SNAPSHOT_SUFFIX,
+    extras_path,
+    pack_extras,
+    sha256_file,
+    write_manifest,
+)
+
+DOWNLOAD_ATTEMPTS = 5
+
+
+def resumable_snapshot(client: QdrantClient, collection: str, directory: str) -> Optional[str]:
+    """Name of a snapshot whose download was interrupted and which the server still has."""
+    on_server = {snapshot.name for snapshot in client.list_snapshots(collection_name=collection)}
+    for name in os.listdir(directory):
+        if name.endswith(SNAPSHOT_SUFFIX + ".part") and name[:-len(".part")] in on_server:
+            return name[:-len(".part")]
+    return None
+
+
+def download(url: str, path: str, attempts: int = DOWNLOAD_ATTEMPTS) -> str:
+    """Stream `url` to `path`, resuming a partial download; return the file's SHA-256."""
+    part = path + ".part"
+    for attempt in range(1, attempts + 1):
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        # Hash what is already on disk, so the checksum covers the whole file after a resume.
+        digest = sha256_file(part) if offset else hashlib.sha256()
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        try:
+            with httpx.stream("GET", url, headers=headers, timeout=httpx.Timeout(60.0, read=600.0)) as response:
+                if offset and response.status_code == 416:
+                    break  # Nothing left to fetch
+                response.raise_for_status()
+                if offset and response.status_code != 206:
+                    offset, digest = 0, hashlib.sha256()  # Server ignored the range; start over
+                total = offset + int(response.headers.get("Content-Length", 0)) or None
+                with open(part, "ab" if offset else "wb") as f, \
+                        tqdm(total=total, initial=offset, unit="B", unit_scale=True) as progress:
+                    for block in response.iter_bytes(BLOCK_BYTES):
+                        f.write(block)
+                        digest.update(block)
+                        progress.update(len(block))
+            break
+        except httpx.TransportError as error:
+            if attempt == attempts:
+                raise
+            print(f"Download interrupted ({error}); resuming (attempt {attempt + 1}/{attempts})...")
+            time.sleep(min(30, 2 ** attempt))
+    os.replace(part, path)
+    return digest.hexdigest()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Snapshot a collection and download it with a checksum manifest")
+    parser.add_argument("--collection", default=None, help="Collection to snapshot (default: the live version)")
+    parser.add_argument("--dir", default=SNAPSHOT_DIR, help="Where the snapshot files are written")
+    parser.add_argument("--keep-remote", action="store_true", help="Keep the snapshot on the Qdrant server afterwards")
+    parser.add_argument("--no-extras", action="store_true", help="Do not pack the chunk store and code graph")
+    args = parser.parse_args()
+
+    client = QdrantClient(url=QDRANT_URL)
+    collection = args.collection or current_version(client) or COLLECTION_NAME
+    os.makedirs(args.dir, exist_ok=True)
+
+    name = resumable_snapshot(client, collection, args.dir)
+    expected = None
+    if name:
+        print(f"Resuming the download of '{name}'")
+    else:
+        print(f"Creating a snapshot of '{collection}'...")
+        snapshot = client.create_snapshot(collection_name=collection, wait=True)
+        name, expected = snapshot.name, snapshot.checksum
+    if expected is None:
+        expected = next((s.checksum for s in client.list_snapshots(collection_name=collection) if s.name == name), None)
+
+    path = os.path.join(args.dir, name)
+    checksum = download(f"{QDRANT_URL.rstrip('/')}/collections/{collection}/snapshots/{name}", path)
+    if expected and checksum != expected:
+        os.remove(path)
+        raise SystemExit(f"Checksum mismatch for {name}: server {expected}, downloaded {checksum}. Run again.")
+    print(f"Downloaded {path} ({os.path.getsize(path) / 1e9:.2f} GB, sha256 {checksum})")
+
+    manifest = {
+        "collection": collection,
+        "points": client.count(collection_name=collection, exact=True).count,
+        "snapshot": name,
+        "size": os.path.getsize(path),
+        "sha256": checksum,
+    }
+    if not args.no_extras and pack_extras(collection, extras_path(path)):
+        manifest["extras"] = os.path.basename(extras_path(path))
+        manifest["extras_sha256"] = sha256_file(extras_path(path)).hexdigest()
+        print(f"Packed the chunk store and code graph into {extras_path(path)}")
+    write_manifest(path, manifest)
+
+    if not args.keep_remote:
+        client.delete_snapshot(collection_name=collection, snapshot_name=name, wait=True)
+    print("Done! Restore it with `python -m scripts.qdrant_import`.")
 
-client = QdrantClient(url=os.getenv("QDRANT_URL"))
-snapshot = client.create_snapshot(collection_name="hytale_codebase")
-print(snapshot)  # Shows name and location, e.g., /qdrant/snapshots/hytale_codebase/...
 
-# Download the snapshot file (via HTTP or copy from storage dir)
-# HTTP example:
-import requests
-snapshot_url = f"http://localhost:6333/collections/hytale_codebase/snapshots/{snapshot.name}"
-with open(f"{snapshot.name}", "wb") as f:
-    f.write(requests.get(snapshot_url).content)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,125 @@
-from qdrant_client import QdrantClient
-import os 
+"""Restore the newest snapshot in SNAPSHOT_DIR and make it the live index version.
 
-COLLECTION = "hytale_codebase"
-SNAPSHOT = "file:///snapshots/hytale_codebase-1863882730595526-2026-02-18-13-57-13.snapshot"
+The snapshot (written by scripts/qdrant_export.py, or copied in by hand) is checked against
+its manifest's SHA-256, then streamed to Qdrant's upload endpoint with `priority=snapshot`,
+so the restored data wins over anything on the node and nothing is buffered in memory.
+When uploading fails it is recovered by file:// location instead, from QDRANT_SNAPSHOT_DIR.
+It is restored into its versioned collection, the chunk store and code graph shipped with
+it are installed, and the COLLECTION_NAME alias is pointed at it.
 
-client = QdrantClient(url=os.getenv("QDRANT_URL"))
+    python -m scripts.qdrant_import                          # skip when an index is live
+    python -m scripts.qdrant_import --force --snapshot data/snapshots/<name>.snapshot
+"""
+import argparse
+import os
+from typing import Optional
 
-if not client.collection_exists(COLLECTION):
-    print(f"🔄 Recovering snapshot into '{COLLECTION}'...")
-    client.recover_snapshot(collection_name=COLLECTION, location=SNAPSHOT)
-    print("✅ Snapshot recovered!")
-else:
-    print(f"✅ Collection '{COLLECTION}' already exists — skipping import.")
\ No newline at end of file
+import httpx
+from qdrant_client import QdrantClient, models
+
+from src.config import COLLECTION_NAME, QDRANT_SNAPSHOT_DIR, QDRANT_URL, SNAPSHOT_DIR
+from rag_setup.index_versions import current_version, is_plain_collection, is_version, new_version_name, promote
+from rag_setup.snapshots import extras_path, latest_snapshot, read_manifest, unpack_extras, verify_checksum
+
+PRIORITIES = [priority.value for priority in models.SnapshotPriority]
+
+
+def upload_snapshot(path: str, collection: str, priority: str, checksum: Optional[str]):
+    """Stream the file to Qdrant as a multipart upload and wait for the recovery."""
+    params = {"wait": "true", "priority": priority}
+    if checksum:
+        params["checksum"] = checksum
+    with open(path, "rb") as f:
+        response = httpx.post(
+            f"{QDRANT_URL.rstrip('/')}/collections/{collection}/snapshots/upload",
+            params=params,
+            files={"snapshot": (os.path.basename(path), f, "application/octet-stream")},
+            timeout=httpx.Timeout(60.0, read=None, write=None),
+        )
+    response.raise_for_status()
+
+
+def recover_from_location(client: QdrantClient, path: str, collection: str, priority: str, checksum: Optional[str]):
+    location = f"file://{QDRANT_SNAPSHOT_DIR.rstrip('/')}/{os.path.basename(path)}"
+    print(f"Recovering from {location}...")
+    client.recover_snapshot(
+        collection_name=collection,
+        location=location,
+        priority=models.SnapshotPriority(priority),
+        checksum=checksum,
+        wait=True,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Restore the newest snapshot and promote it to the live index")
+    parser.add_argument("--dir", default=SNAPSHOT_DIR, help="Directory searched for the newest snapshot")
+    parser.add_argument("--snapshot", default=None, help="Snapshot file to restore instead of the newest one")
+    parser.add_argument("--method", choices=("upload", "location"), default="upload",
+                        help="Upload the file (default), or have Qdrant read it from QDRANT_SNAPSHOT_DIR")
+    parser.add_argument("--priority", choices=PRIORITIES, default="snapshot", help="Qdrant recovery priority")
+    parser.add_argument("--force", action="store_true", help="Restore and promote even when an index is already live")
+    parser.add_argument("--no-verify", action="store_true", help="Skip the SHA-256 check")
+    parser.add_argument("--no-promote", action="store_true", help="Restore only; leave the alias alone")
+    parser.add_argument(
+        "--replace-plain-collection", action="store_true",
+        help=f"Migration: if '{COLLECTION_NAME}' is a real collection, delete it and create the alias in its place",
+    )
+    args = parser.parse_args()
+
+    client = QdrantClient(url=QDRANT_URL)
+    live = current_version(client) or (COLLECTION_NAME if client.collection_exists(COLLECTION_NAME) else None)
+    if live and not args.force:
+        print(f"✅ '{COLLECTION_NAME}' is already live ({live}) — skipping import.")
+        return
+    if is_plain_collection(client) and not (args.no_promote or args.replace_plain_collection):
+        raise SystemExit(
+            f"'{COLLECTION_NAME}' is a real collection, not an alias. Add --replace-plain-collection to "
+            f"swap it for the alias after the restore, or --no-promote to only restore."
+        )
+
+    path = args.snapshot or latest_snapshot(args.dir)
+    if path is None:
+        raise SystemExit(f"No snapshot found in {args.dir}. Run `python -m scripts.qdrant_export` first.")
+    manifest = read_manifest(path) or {}
+    source = manifest.get("collection")
+    # Exports of a version restore under its name, so their chunk store and graph line up.
+    # Anything else, including an export of the plain COLLECTION_NAME collection, gets a new
+    # version: restoring into COLLECTION_NAME would be deleted again by the promotion.
+    collection = source if is_version(source) else new_version_name()
+    checksum = manifest.get("sha256")
+    print(f"Snapshot: {path} -> '{collection}'")
+
+    if checksum and not args.no_verify:
+        print("Verifying checksum...")
+        verify_checksum(path, checksum)
+
+    if client.collection_exists(collection):
+        print(f"'{collection}' already exists — not restoring it again.")
+    elif args.method == "upload":
+        print(f"🔄 Uploading snapshot into '{collection}' (priority: {args.priority})...")
+        try:
+            upload_snapshot(path, collection, args.priority, checksum)
+        except httpx.HTTPError as error:
+            print(f"Upload failed ({error}); falling back to recovery by location.")
+            recover_from_location(client, path, collection, args.priority, checksum)
+    else:
+        recover_from_location(client, path, collection, args.priority, checksum)
+    print(f"✅ Restored {client.count(collection_name=collection, exact=True).count} points.")
+
+    extras = manifest.get("extras") and extras_path(path)
+    if extras and os.path.exists(extras):
+        if not args.no_verify:
+            verify_checksum(extras, manifest["extras_sha256"])
+        unpack_extras(extras, collection, source_collection=source)
+        print("Installed the chunk store and code graph.")
+
+    if args.no_promote:
+        print(f"Done! '{collection}' is restored but not live (--no-promote).")
+        return
+    previous = promote(client, collection, replace_plain_collection=args.replace_plain_collection)
+    print(f"✅ Alias '{COLLECTION_NAME}' now points to '{collection}' (was: {previous or 'none'}).")
+
+
+if __name__ == "__main__":
+    main()
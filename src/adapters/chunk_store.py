@@ -0,0 +1,175 @@
+import json
+import mmap
+import os
+import re
+import shutil
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from src.config import CHUNK_STORE_DIR, INDEX_VERSIONS_CACHED
+
+FORMAT_VERSION = 1
+# Variable-length columns: one UTF-8 blob each plus an int64 offsets array (rows + 1 entries).
+# List columns are stored newline-joined.
+STRING_COLUMNS = ("content", "path", "class_names", "method_names", "alias_paths")
+LIST_COLUMNS = ("class_names", "method_names", "alias_paths")
+
+
+def _line_range(chunk: Dict) -> Tuple[int, int]:
+    """(start, end) of a file fragment, (0, 0) for a full file."""
+    numbers = re.findall(r"\d+", str(chunk.get("metadata", {}).get("lines", "")))
+    return (int(numbers[0]), int(numbers[1])) if len(numbers) == 2 else (0, 0)
+
+
+class ChunkStoreWriter:
+    """Appends chunks to a new store; the directory only appears, complete, on close()."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._tmp = directory.rstrip("/\\") + ".tmp"
+        shutil.rmtree(self._tmp, ignore_errors=True)
+        os.makedirs(self._tmp)
+        self._blobs = {name: open(os.path.join(self._tmp, f"{name}.bin"), "wb") for name in STRING_COLUMNS}
+        self._offsets: Dict[str, List[int]] = {name: [0] for name in STRING_COLUMNS}
+        self._lines: List[Tuple[int, int]] = []
+
+    def add(self, chunk: Dict):
+        for name in STRING_COLUMNS:
+            value = chunk.get(name, [] if name in LIST_COLUMNS else "")
+            data = ("\n".join(value) if name in LIST_COLUMNS else value).encode("utf-8")
+            self._blobs[name].write(data)
+            self._offsets[name].append(self._offsets[name][-1] + len(data))
+        self._lines.append(_line_range(chunk))
+
+    def close(self) -> int:
+        for name, blob in self._blobs.items():
+            blob.close()
+            np.save(os.path.join(self._tmp, f"{name}.offsets.npy"), np.asarray(self._offsets[name], dtype=np.int64))
+        np.save(os.path.join(self._tmp, "lines.npy"), np.asarray(self._lines, dtype=np.int32).reshape(-1, 2))
+        with open(os.path.join(self._tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"format": FORMAT_VERSION, "rows": len(self._lines)}, f)
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.replace(self._tmp, self.directory)
+        return len(self._lines)
+
+    def abort(self):
+        for blob in self._blobs.values():
+            blob.close()
+        shutil.rmtree(self._tmp, ignore_errors=True)
+
+
+def write_chunk_store(chunks: Iterable[Dict], directory: str) -> int:
+    """Write `chunks` as a new store, replacing any store already in `directory`."""
+    writer = ChunkStoreWriter(directory)
+    try:
+        for chunk in chunks:
+            writer.add(chunk)
+    except BaseException:
+        writer.abort()
+        raise
+    return writer.close()
+
+
+class ChunkStore:
+    """Read-only, memory-mapped chunk store. Row i is the chunk with point id i.
+
+    Only the pages of the rows actually read are loaded, so opening a store is instant and
+    looking up a chunk by id costs a few slices of the mapped files.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported chunk store format in {directory}: {meta.get('format')}")
+        self.rows = meta["rows"]
+        self._columns = {}
+        for name in STRING_COLUMNS:
+            offsets = np.load(os.path.join(directory, f"{name}.offsets.npy"), mmap_mode="r")
+            self._columns[name] = (self._map(os.path.join(directory, f"{name}.bin")), offsets)
+        self.lines = np.load(os.path.join(directory, "lines.npy"), mmap_mode="r")
+
+    @staticmethod
+    def _map(path: str):
+        if os.path.getsize(path) == 0:
+            return b""  # mmap cannot map an empty file
+        with open(path, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        """Unmap the store; it cannot be read afterwards."""
+        for blob, _ in self._columns.values():
+            if isinstance(blob, mmap.mmap):
+                blob.close()
+        self._columns = {}
+        self.lines = None
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def __iter__(self) -> Iterator[Dict]:
+        for row in range(self.rows):
+            yield self[row]
+
+    def string(self, name: str, row: int) -> str:
+        blob, offsets = self._columns[name]
+        return blob[int(offsets[row]):int(offsets[row + 1])].decode("utf-8")
+
+    def strings(self, name: str, row: int) -> List[str]:
+        value = self.string(name, row)
+        return value.split("\n") if value else []
+
+    def lines_info(self, row: int) -> str:
+        start, end = (int(value) for value in self.lines[row])
+        return f"{start}–{end}" if start else "full file"
+
+    def __getitem__(self, row: int) -> Dict:
+        """The chunk as stored in Qdrant payloads: path, content, metadata and symbols."""
+        if not 0 <= row < self.rows:
+            raise IndexError(row)
+        path = self.string("path", row)
+        metadata = {"path": path, "type": "full_file"}
+        if self.lines[row][0]:
+            metadata.update(type="file_fragment", lines=self.lines_info(row))
+        return {
+            "path": path,
+            "content": self.string("content", row),
+            "metadata": metadata,
+            "class_names": self.strings("class_names", row),
+            "method_names": self.strings("method_names", row),
+            "alias_paths": self.strings("alias_paths", row),
+        }
+
+
+def chunk_store_path(collection: str) -> str:
+    return os.path.join(CHUNK_STORE_DIR, collection)
+
+
+_stores: "OrderedDict[str, ChunkStore]" = OrderedDict()
+_stores_lock = threading.Lock()
+
+
+def get_chunk_store(collection: str) -> Optional[ChunkStore]:
+    """The store written for `collection`, or None when that index version has none.
+
+    The INDEX_VERSIONS_CACHED most recently used stores stay mapped and older ones are
+    closed. By then the alias has moved on twice, so no request still reads them. A missing
+    store is not remembered, so one installed later (e.g. by an import) is picked up.
+    """
+    with _stores_lock:
+        store = _stores.get(collection)
+        if store is not None:
+            _stores.move_to_end(collection)
+            return store
+        path = chunk_store_path(collection)
+        if not os.path.exists(os.path.join(path, "meta.json")):
+            return None
+        store = _stores[collection] = ChunkStore(path)
+        while len(_stores) > INDEX_VERSIONS_CACHED:
+            _, evicted = _stores.popitem(last=False)
+            evicted.close()
+        return store
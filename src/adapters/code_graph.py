@@ -0,0 +1,106 @@
+import math
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from src.config import CODE_GRAPH_DIR, INDEX_VERSIONS_CACHED
+
+# Edge kinds, by value stored in `edge_types`. An edge i -> j reads "chunk i <kind> chunk j".
+EDGE_KINDS = ("extends", "references", "calls")
+EDGE_WEIGHTS = (3.0, 2.0, 1.0)  # A supertype is usually more useful context than a callee
+
+
+class CodeGraph:
+    """Chunk-to-chunk structure graph, built at ingest by rag_setup/code_graph.py.
+
+    Nodes are point ids. Outgoing edges are stored in CSR form: node i links to
+    indices[indptr[i]:indptr[i + 1]], with the matching kinds in edge_types.
+    """
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, edge_types: np.ndarray):
+        self.indptr = indptr
+        self.indices = indices
+        self.edge_types = edge_types
+        self.in_degree = np.bincount(indices, minlength=self.num_nodes)
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.indptr) - 1
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.indices)
+
+    @classmethod
+    def from_edges(cls, num_nodes: int, edges: Iterable[Tuple[int, int, int]]) -> "CodeGraph":
+        """Build from (source, target, kind) triples; duplicates and self-loops are dropped."""
+        unique = sorted({(s, t, k) for s, t, k in edges if s != t})
+        sources = np.fromiter((s for s, _, _ in unique), dtype=np.int64, count=len(unique))
+        indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=num_nodes), out=indptr[1:])
+        indices = np.fromiter((t for _, t, _ in unique), dtype=np.int32, count=len(unique))
+        edge_types = np.fromiter((k for _, _, k in unique), dtype=np.int8, count=len(unique))
+        return cls(indptr, indices, edge_types)
+
+    @classmethod
+    def load(cls, path: str) -> "CodeGraph":
+        with np.load(path) as data:
+            return cls(data["indptr"], data["indices"], data["edge_types"])
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez_compressed(path, indptr=self.indptr, indices=self.indices, edge_types=self.edge_types)
+
+    def expand(self, seeds: Sequence[int], exclude: Set[int], limit: int) -> List[Tuple[int, int, int]]:
+        """Best one-hop neighbors of `seeds`, as (target, seed, kind) for the strongest link.
+
+        Links from higher-ranked seeds count more, and targets many chunks point at
+        (common base classes, utilities) are damped, so hubs do not crowd out specific code.
+        """
+        scores: Dict[int, List] = {}
+        for rank, seed in enumerate(seeds):
+            if not 0 <= seed < self.num_nodes:
+                continue
+            start, end = self.indptr[seed], self.indptr[seed + 1]
+            for target, kind in zip(self.indices[start:end].tolist(), self.edge_types[start:end].tolist()):
+                if target in exclude:
+                    continue
+                weight = EDGE_WEIGHTS[kind] / (rank + 1) / math.log2(2 + self.in_degree[target])
+                entry = scores.setdefault(target, [0.0, 0.0, seed, kind])
+                entry[0] += weight
+                if weight > entry[1]:
+                    entry[1:] = [weight, seed, kind]
+
+        best = sorted(scores.items(), key=lambda item: item[1][0], reverse=True)[:limit]
+        return [(target, seed, kind) for target, (_, _, seed, kind) in best]
+
+
+def graph_path(collection: str) -> str:
+    return os.path.join(CODE_GRAPH_DIR, f"{collection}.npz")
+
+
+_graphs: "OrderedDict[str, CodeGraph]" = OrderedDict()
+_graphs_lock = threading.Lock()
+
+
+def get_code_graph(collection: str) -> Optional[CodeGraph]:
+    """The graph built for `collection`, or None when that index version has none.
+
+    Only the INDEX_VERSIONS_CACHED most recently used graphs are kept in memory. A missing
+    graph is not remembered, so one installed later is picked up.
+    """
+    with _graphs_lock:
+        graph = _graphs.get(collection)
+        if graph is not None:
+            _graphs.move_to_end(collection)
+            return graph
+        path = graph_path(collection)
+        if not os.path.exists(path):
+            return None
+        graph = _graphs[collection] = CodeGraph.load(path)
+        while len(_graphs) > INDEX_VERSIONS_CACHED:
+            _graphs.popitem(last=False)
+        return graph
@@ -0,0 +1,161 @@
+import functools
+import re
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from src.config import PROMPT_COMPACTION_CACHE_SIZE, PROMPT_COMPACTION_INDENT
+
+BLANK_RUN_MIN = 3  # Shorter blank runs cost less than the line marker replacing them
+IMPORT_FOLD_MIN = 3  # Import blocks with fewer lines are kept as they are
+ELIDE_MIN_LINES = 3  # Method bodies shorter than this are kept even when eliding
+
+_IMPORT = re.compile(r"^\s*import\s+(static\s+)?([\w.]+?)(\.\*)?\s*;\s*$")
+_PACKAGE = re.compile(r"^\s*package\s+[\w.]+\s*;")
+_VINEFLOWER_COMMENT = re.compile(r"^\s*//\s*\$VF:")
+_KEEP_VINEFLOWER = re.compile(r"Couldn't be decompiled", re.IGNORECASE)
+# Modifiers/return type, then name(params) and an opening brace ending the line.
+_METHOD_DECLARATION = re.compile(
+    r"^\s*(?:[\w$<>\[\],.?@]+\s+)+([\w$]+)\s*\([^;]*\)\s*(?:throws\s+[\w.,\s]+?)?\s*\{\s*$"
+)
+_NOT_METHODS = {"if", "for", "while", "switch", "catch", "synchronized", "else", "try", "do", "return", "new"}
+_LITERALS = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])+\'|//.*$')
+_ESTIMATE_TOKENS = re.compile(r"\w+|[^\w\s]|\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (words, symbols and whitespace runs), for comparing sizes."""
+    return len(_ESTIMATE_TOKENS.findall(text))
+
+
+def first_line_number(lines_info: str) -> int:
+    """First line of a chunk from its "start–end" lines metadata; 1 for a full file."""
+    match = re.match(r"\s*(\d+)", str(lines_info))
+    return int(match.group(1)) if match else 1
+
+
+def _braces(line: str) -> int:
+    code = _LITERALS.sub("", line)
+    return code.count("{") - code.count("}")
+
+
+def _license_header_end(lines: List[str]) -> int:
+    """Index after a comment block at the top of a file, when code (package/import) follows it."""
+    i = 0
+    in_block = False
+    while i < len(lines):
+        stripped = lines[i].strip()
+        if in_block:
+            in_block = "*/" not in stripped
+        elif stripped.startswith("/*"):
+            in_block = "*/" not in stripped
+        elif not (stripped.startswith("//") or not stripped):
+            break
+        i += 1
+    if i and i < len(lines) and (_PACKAGE.match(lines[i]) or _IMPORT.match(lines[i])):
+        return i
+    return 0
+
+
+def _import_summary(imports: List[Tuple[str, str, str]]) -> str:
+    """One line listing imported names grouped by package, e.g. `java.util.{List, Map}`."""
+    grouped: Dict[str, List[str]] = defaultdict(list)
+    for static, name, wildcard in imports:
+        if wildcard:
+            package, member = name, "*"
+        else:
+            package, _, member = name.rpartition(".")
+        grouped[f"{static}{package}"].append(member)
+    parts = [
+        f"{package}.{members[0]}" if len(members) == 1 else f"{package}.{{{', '.join(members)}}}"
+        for package, members in grouped.items()
+    ]
+    return f"// imports ({len(imports)}): " + "; ".join(parts)
+
+
+def _body_end(lines: List[str], start: int) -> Optional[int]:
+    """Index of the line closing the method opened on `lines[start]`, or None."""
+    if _braces(lines[start]) != 1:
+        return None
+    depth = 1
+    for j in range(start + 1, len(lines)):
+        depth += _braces(lines[j])
+        if depth <= 0:
+            return j if depth == 0 and lines[j].strip() == "}" else None
+    return None  # Body continues past the end of the chunk
+
+
+def _indent_unit(lines: List[str]) -> int:
+    widths = [
+        len(line) - len(line.lstrip(" "))
+        for line in lines
+        if line.startswith(" ") and line.strip() and not line.lstrip().startswith("*")
+    ]
+    return max(1, min(widths)) if widths else 4
+
+
+@functools.lru_cache(maxsize=PROMPT_COMPACTION_CACHE_SIZE)
+def compact_java(content: str, first_line: int = 1, elide_bodies: bool = False) -> str:
+    """Compacted Java for the prompt, with line numbers kept recoverable.
+
+    Wherever lines were dropped, a `// L<n>` line says that the next line is line n of the
+    file, and lines run on consecutively from there. Drops license headers, VineFlower
+    notes (except failed decompilations) and long blank runs, folds the import block into
+    one summary line, and reindents. With `elide_bodies`, method bodies become `{ ... }`.
+    """
+    lines = [line.rstrip().expandtabs(4) for line in content.split("\n")]
+    unit = _indent_unit(lines)
+    output: List[str] = []
+    expected = first_line
+
+    def emit(index: int, text: str):
+        nonlocal expected
+        number = first_line + index
+        if number != expected:
+            output.append(f"// L{number}")
+        stripped = text.lstrip(" ")
+        width = len(text) - len(stripped)
+        output.append(" " * (width // unit * PROMPT_COMPACTION_INDENT + width % unit) + stripped)
+        expected = number + 1
+
+    i = _license_header_end(lines) if first_line == 1 else 0
+    while i < len(lines):
+        line = lines[i]
+        if not line:
+            run_end = i
+            while run_end < len(lines) and not lines[run_end]:
+                run_end += 1
+            if run_end - i < BLANK_RUN_MIN:
+                for k in range(i, run_end):
+                    emit(k, "")
+            i = run_end
+            continue
+
+        if _VINEFLOWER_COMMENT.match(line) and not _KEEP_VINEFLOWER.search(line):
+            i += 1
+            continue
+
+        if _IMPORT.match(line):
+            end = i
+            imports = []
+            while end < len(lines) and (not lines[end] or _IMPORT.match(lines[end])):
+                match = _IMPORT.match(lines[end])
+                if match:
+                    imports.append(("static " if match.group(1) else "", match.group(2), match.group(3) or ""))
+                end += 1
+            if len(imports) >= IMPORT_FOLD_MIN:
+                output.append(_import_summary(imports))
+                i = end
+                continue
+
+        if elide_bodies:
+            match = _METHOD_DECLARATION.match(line)
+            end = _body_end(lines, i) if match and line.split()[0] not in _NOT_METHODS else None
+            if end is not None and end - i - 1 >= ELIDE_MIN_LINES:
+                emit(i, f"{line} ... }}")
+                i = end + 1
+                continue
+
+        emit(i, line)
+        i += 1
+
+    return "\n".join(output)
@@ -1,36 +1,202 @@
 import os
-from typing import List, Dict
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import List, Dict, Optional
+
+import httpx
 from openai import OpenAI
 
 from src.config import (
     LLM_BASE_URL,
     LLM_MODEL,
     LLM_ENVIRONMENT_KEY_NAME,
+    LLM_HEDGE_MODEL,
+    LLM_HEDGE_PERCENTILE,
+    LLM_HEDGE_DEFAULT_DELAY_SECONDS,
+    LLM_HEDGE_MIN_DELAY_SECONDS,
+    LLM_HEDGE_MIN_SAMPLES,
+    LLM_HEDGE_WINDOW,
+    LLM_REQUEST_TIMEOUT_SECONDS,
+    LLM_CONNECT_TIMEOUT_SECONDS,
+    LLM_MAX_CONNECTIONS,
+    LLM_MAX_KEEPALIVE_CONNECTIONS,
+    LLM_KEEPALIVE_EXPIRY_SECONDS,
+    LLM_PRICES_PER_MILLION_TOKENS,
+    METRICS_FILE,
 )
 
 from src.domain.ports import LLMCompleter
+from src.utils import log_usage_metric
+
+
+class _AttemptCancelled(Exception):
+    """Raised inside an attempt that lost the race."""
 
 
 class OpenAICompatibleCompleter:
-    """Generic adapter for OpenAI-compatible vendors."""
+    """Generic adapter for OpenAI-compatible vendors.
+
+    Every completion has a deadline. When a hedge model is set and the primary model has
+    not answered after the LLM_HEDGE_PERCENTILE of its recent latencies, the same request
+    is sent to the hedge model; the first answer wins and the other stream is closed.
+    `complete` can be given a model per call (see model routing in the application layer);
+    latencies are tracked per model, and a request already on the hedge model is not hedged.
+    """
     def __init__(
         self,
         base_url: str,
         api_key: str,
-        model: str
+        model: str,
+        hedge_model: Optional[str] = LLM_HEDGE_MODEL,
+        timeout: float = LLM_REQUEST_TIMEOUT_SECONDS,
     ):
         if not api_key:
             raise ValueError("API key is required for LLM completer.")
 
-        self.client = OpenAI(base_url=base_url, api_key=api_key)
+        # One pooled, keep-alive HTTP client shared by all attempts and threads.
+        http_client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=LLM_KEEPALIVE_EXPIRY_SECONDS,
+            ),
+            timeout=httpx.Timeout(timeout, connect=LLM_CONNECT_TIMEOUT_SECONDS),
+        )
+        self.client = OpenAI(base_url=base_url, api_key=api_key, http_client=http_client)
         self.model = model
+        self.hedge_model = hedge_model
+        self.timeout = timeout
+        self.primary_latencies: Dict[str, deque] = defaultdict(lambda: deque(maxlen=LLM_HEDGE_WINDOW))
+        self.executor = ThreadPoolExecutor(max_workers=2 * LLM_MAX_CONNECTIONS, thread_name_prefix="llm")
+
+    def hedge_delay(self, model: str) -> float:
+        """Seconds to wait for `model` before firing the hedge."""
+        samples = sorted(self.primary_latencies[model])
+        if len(samples) < LLM_HEDGE_MIN_SAMPLES:
+            return LLM_HEDGE_DEFAULT_DELAY_SECONDS
+        index = min(len(samples) - 1, int(len(samples) * LLM_HEDGE_PERCENTILE / 100))
+        return max(LLM_HEDGE_MIN_DELAY_SECONDS, samples[index])
+
+    def complete(self, messages: List[Dict], model: Optional[str] = None) -> str:
+        model = model or self.model
+        hedge_model = self.hedge_model if self.hedge_model != model else None
+        started = time.perf_counter()
+        deadline = started + self.timeout
+        attempts: Dict[Future, Dict] = {}
+
+        def launch(path: str, attempt_model: str):
+            attempt = {"path": path, "model": attempt_model, "cancelled": threading.Event(), "stream": None, "usage": None}
+            attempts[self.executor.submit(self._attempt, attempt_model, messages, attempt, deadline)] = attempt
+
+        launch("primary", model)
+        hedge_delay = self.hedge_delay(model) if hedge_model else None
 
-    def complete(self, messages: List[Dict]) -> str:
-        response = self.client.chat.completions.create(
-            model=self.model,
+        winner = None
+        errors = []
+        pending = set(attempts)
+        while pending:
+            timeout = deadline - time.perf_counter()
+            hedge_pending = hedge_model and len(attempts) == 1
+            if hedge_pending:
+                timeout = min(timeout, started + hedge_delay - time.perf_counter())
+            done, pending = wait(pending, timeout=max(0.0, timeout), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                if future.exception() is None:
+                    winner = future
+                    break
+                errors.append(future.exception())
+            if winner is not None:
+                break
+
+            if hedge_pending and time.perf_counter() < deadline:
+                # The primary is slow (or already failed): race the hedge model against it.
+                launch("hedge", hedge_model)
+                pending = {f for f, a in attempts.items() if not f.done()}
+            elif not done:
+                break  # Deadline reached
+
+        elapsed = time.perf_counter() - started
+        primary = next(f for f, a in attempts.items() if a["path"] == "primary")
+        primary_failed = primary is not winner and primary.done() and primary.exception() is not None
+        if winner is not None and not primary_failed:
+            # When the hedge won this is a censored sample: the primary took at least this long.
+            self.primary_latencies[model].append(elapsed)
+
+        for future, attempt in attempts.items():
+            if future is not winner:
+                self._cancel(attempt)
+
+        metric = {
+            "requested_model": model,
+            "model": attempts[winner]["model"] if winner is not None else None,
+            "winner": attempts[winner]["path"] if winner is not None else None,
+            "hedged": len(attempts) > 1,
+            "hedge_delay_seconds": round(hedge_delay, 3) if hedge_delay is not None else None,
+            "duration_seconds": round(elapsed, 3),
+            "success": winner is not None,
+        }
+        if winner is not None:
+            # Usage of the winning attempt only; a cancelled loser's tokens are not reported.
+            metric.update(self._usage_metric(attempts[winner]["model"], attempts[winner]["usage"]))
+        if winner is None:
+            metric["error_reason"] = type(errors[0]).__name__ if errors else "DeadlineExceeded"
+        log_usage_metric("llm_completion", metric, filename=METRICS_FILE)
+
+        if winner is None:
+            if errors:
+                raise errors[0]
+            raise TimeoutError(f"LLM completion exceeded its {self.timeout:g}s deadline")
+        return winner.result()
+
+    def _attempt(self, model: str, messages: List[Dict], attempt: Dict, deadline: float) -> str:
+        stream = self.client.chat.completions.create(
+            model=model,
             messages=messages,
+            stream=True,
+            stream_options={"include_usage": True},
+            timeout=max(1.0, deadline - time.perf_counter()),
         )
-        return response.choices[0].message.content
+        attempt["stream"] = stream
+        parts = []
+        try:
+            for chunk in stream:
+                if attempt["cancelled"].is_set():
+                    raise _AttemptCancelled()
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                if getattr(chunk, "usage", None) is not None:
+                    attempt["usage"] = chunk.usage
+        finally:
+            stream.close()
+        if attempt["cancelled"].is_set():
+            raise _AttemptCancelled()
+        return "".join(parts)
+
+    @staticmethod
+    def _usage_metric(model: str, usage) -> Dict:
+        if usage is None:
+            return {"prompt_tokens": None, "completion_tokens": None, "cost_usd": None}
+        metric = {"prompt_tokens": usage.prompt_tokens, "completion_tokens": usage.completion_tokens, "cost_usd": None}
+        prices = LLM_PRICES_PER_MILLION_TOKENS.get(model)
+        if prices is not None:
+            input_price, output_price = prices
+            cost = (usage.prompt_tokens * input_price + usage.completion_tokens * output_price) / 1_000_000
+            metric["cost_usd"] = round(cost, 6)
+        return metric
+
+    @staticmethod
+    def _cancel(attempt: Dict):
+        attempt["cancelled"].set()
+        stream = attempt["stream"]
+        if stream is not None:
+            try:
+                # Closing the response drops the connection, so the proxy stops generating.
+                stream.close()
+            except Exception:
+                pass
 
 
 def get_llm_completer() -> LLMCompleter:
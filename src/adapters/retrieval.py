@@ -1,77 +1,532 @@
+import math
+import multiprocessing
 import re
-from typing import List
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from typing import Dict, List, Optional, Sequence, Tuple
 
-from sentence_transformers import SentenceTransformer
-from qdrant_client import QdrantClient
+import numpy as np
 
-from src.config import EMBEDDING_MODEL_NAME, QDRANT_URL, COLLECTION_NAME
+from src.config import (
+    EMBEDDING_MODEL_NAME,
+    EMBEDDING_SERVER_URL,
+    EMBEDDING_SERVER_TIMEOUT_SECONDS,
+    RETRIEVAL_WORKER_PROCESSES,
+    RETRIEVAL_WORKER_TORCH_THREADS,
+    QDRANT_URL,
+    COLLECTION_NAME,
+    INDEX_VERSION_TTL_SECONDS,
+    RETRIEVAL_CANDIDATE_MULTIPLIER,
+    RETRIEVAL_KEYWORD_BOOST,
+    RETRIEVAL_BOOST_WEIGHT,
+    RERANKER_MODEL_NAME,
+    RERANK_CANDIDATES,
+    RERANK_MAX_CHARS,
+    RERANK_BATCH_SIZE,
+    RERANK_TIME_BUDGET_SECONDS,
+    RETRIEVAL_ADAPTIVE_TOP_K,
+    RETRIEVAL_MIN_TOP_K,
+    RETRIEVAL_RELATIVE_SCORE_CUTOFF,
+    RETRIEVAL_ABSOLUTE_SCORE_FLOOR,
+    RERANK_RELATIVE_SCORE_CUTOFF,
+    RERANK_ABSOLUTE_SCORE_FLOOR,
+    RERANK_SCORES_ARE_LOGITS,
+    RETRIEVAL_CONTEXT_BUDGET_CHARS,
+    RETRIEVAL_LOG_TAIL,
+    RETRIEVAL_MAX_ALIAS_PATHS,
+    RETRIEVAL_GRAPH_EXPANSION,
+    RETRIEVAL_GRAPH_SEEDS,
+    RETRIEVAL_GRAPH_MAX_NEIGHBORS,
+    PROMPT_COMPACTION,
+    PROMPT_COMPACTION_FULL_CHUNKS,
+    METRICS_FILE,
+)
+from src.adapters.chunk_store import get_chunk_store
+from src.adapters.code_graph import EDGE_KINDS, get_code_graph
+from src.adapters.compaction import compact_java, estimate_tokens, first_line_number
+from src.domain.ports import RetrievedContext
+from src.utils import log_usage_metric
 
-emb_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
-emb_client = QdrantClient(url=QDRANT_URL)
+# Heavy dependencies (torch via sentence-transformers, the Qdrant client) are imported and
+# loaded on first use, so importing this module is cheap. Call warm_up() to load them ahead
+# of the first query.
+emb_model = None
+emb_client = None
+reranker_model = None
+embedder = None
+_load_lock = threading.Lock()
+_index_version = (None, 0.0)
+
+
+def get_embedding_model():
+    global emb_model
+    if emb_model is None:
+        with _load_lock:
+            if emb_model is None:
+                from sentence_transformers import SentenceTransformer
+                emb_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+    return emb_model
+
+
+def get_qdrant_client():
+    global emb_client
+    if emb_client is None:
+        with _load_lock:
+            if emb_client is None:
+                from qdrant_client import QdrantClient
+                emb_client = QdrantClient(url=QDRANT_URL)
+    return emb_client
+
+
+class LocalEmbedder:
+    """Embeds in this process, with its own copy of the model."""
+
+    def encode(self, texts: Sequence[str], batch_size: int = 32) -> np.ndarray:
+        return get_embedding_model().encode(
+            list(texts), batch_size=batch_size, normalize_embeddings=True, show_progress_bar=False
+        )
+
+    def dimension(self) -> int:
+        return get_embedding_model().get_sentence_embedding_dimension()
+
+
+class RemoteEmbedder:
+    """Embeds through the shared embedding server (src/interfaces/embedding_server.py).
+
+    Vectors come back as raw little-endian float32 with an `X-Embedding-Shape: rows,dim`
+    header, already normalized. The HTTP client keeps connections alive across calls.
+    """
+
+    def __init__(self, base_url: str, timeout: float = EMBEDDING_SERVER_TIMEOUT_SECONDS):
+        import httpx
+        self.client = httpx.Client(base_url=base_url, timeout=timeout)
+
+    def encode(self, texts: Sequence[str], batch_size: int = 32) -> np.ndarray:
+        response = self.client.post("/embed", json={"texts": list(texts)})
+        response.raise_for_status()
+        rows, dim = (int(n) for n in response.headers["X-Embedding-Shape"].split(","))
+        return np.frombuffer(response.content, dtype="<f4").reshape(rows, dim)
+
+    def dimension(self) -> int:
+        response = self.client.get("/health")
+        response.raise_for_status()
+        return response.json()["dimension"]
+
+
+def _init_worker(torch_threads: int):
+    import torch
+    torch.set_num_threads(torch_threads)
+    get_embedding_model()
+    get_reranker_model()
+
+
+def _encode_in_worker(texts: List[str], batch_size: int) -> Tuple[bytes, int, int]:
+    vectors = np.asarray(LocalEmbedder().encode(texts, batch_size=batch_size), dtype="<f4")
+    return vectors.tobytes(), vectors.shape[0], vectors.shape[1]
+
+
+def _rerank_in_worker(query: str, texts: List[str]) -> bytes:
+    scores = get_reranker_model().predict(
+        [(query, text) for text in texts], batch_size=RERANK_BATCH_SIZE, show_progress_bar=False
+    )
+    return np.asarray(scores, dtype="<f4").tobytes()
+
+
+class ProcessPoolEmbedder:
+    """Runs query encoding and reranking in worker processes, each with preloaded models.
+
+    Model inference then runs outside this process's GIL, so concurrent queries use
+    separate cores and the caller's event loop stays responsive. Arguments are plain
+    strings and results come back as raw float32 bytes, which keeps IPC cheap.
+    """
+
+    def __init__(self, workers: int, torch_threads: int = RETRIEVAL_WORKER_TORCH_THREADS):
+        self.workers = workers
+        self.pool = ProcessPoolExecutor(
+            max_workers=workers,
+            # Forking a process that already imported torch is unsafe.
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(torch_threads,),
+        )
+
+    def encode(self, texts: Sequence[str], batch_size: int = 32) -> np.ndarray:
+        data, rows, dim = self.pool.submit(_encode_in_worker, list(texts), batch_size).result()
+        return np.frombuffer(data, dtype="<f4").reshape(rows, dim)
+
+    def rerank_scores(self, query: str, texts: Sequence[str]) -> np.ndarray:
+        return np.frombuffer(self.pool.submit(_rerank_in_worker, query, list(texts)).result(), dtype="<f4")
+
+    def dimension(self) -> int:
+        return self.encode(["dimension"]).shape[1]
+
+    def warm_up(self):
+        """Start every worker and load its models; concurrent tasks force all of them up."""
+        wait([self.pool.submit(_encode_in_worker, ["warm up"], 1) for _ in range(self.workers)])
+
+
+def get_embedder():
+    """Return the embedding backend.
+
+    The shared server client when EMBEDDING_SERVER_URL is set, otherwise a worker-process
+    pool when RETRIEVAL_WORKER_PROCESSES > 0, otherwise an in-process embedder.
+    """
+    global embedder
+    if embedder is None:
+        with _load_lock:
+            if embedder is None:
+                if EMBEDDING_SERVER_URL:
+                    embedder = RemoteEmbedder(EMBEDDING_SERVER_URL)
+                elif RETRIEVAL_WORKER_PROCESSES > 0:
+                    embedder = ProcessPoolEmbedder(RETRIEVAL_WORKER_PROCESSES)
+                else:
+                    embedder = LocalEmbedder()
+    return embedder
+
+
+def get_reranker_model():
+    """Return the cross-encoder, or None when reranking is not configured."""
+    global reranker_model
+    if reranker_model is None and RERANKER_MODEL_NAME:
+        with _load_lock:
+            if reranker_model is None:
+                from sentence_transformers import CrossEncoder
+                reranker_model = CrossEncoder(RERANKER_MODEL_NAME, device="cpu")
+    return reranker_model
+
+
+def get_index_version() -> str:
+    """Name of the versioned collection behind the COLLECTION_NAME alias.
+
+    Cached for INDEX_VERSION_TTL_SECONDS, so a promoted rebuild is picked up shortly after
+    the swap. Include it in any cache key derived from retrieval results (e.g. an answer
+    cache) so entries from an older index are never served. Falls back to COLLECTION_NAME
+    when it is a plain collection rather than an alias.
+    """
+    global _index_version
+    version, resolved_at = _index_version
+    if version is None or time.monotonic() - resolved_at > INDEX_VERSION_TTL_SECONDS:
+        version = COLLECTION_NAME
+        for alias in get_qdrant_client().get_aliases().aliases:
+            if alias.alias_name == COLLECTION_NAME:
+                version = alias.collection_name
+                break
+        _index_version = (version, time.monotonic())
+    return version
+
+
+def predict_rerank_scores(query: str, texts: Sequence[str]) -> np.ndarray:
+    """Cross-encoder scores for (query, text) pairs, in worker processes when configured."""
+    active = get_embedder()
+    if isinstance(active, ProcessPoolEmbedder):
+        return active.rerank_scores(query, texts)
+    return np.asarray(get_reranker_model().predict(
+        [(query, text) for text in texts], batch_size=RERANK_BATCH_SIZE, show_progress_bar=False
+    ))
+
+
+def warm_up():
+    """Load the models and run a dummy encode and search so the first real query is fast."""
+    active = get_embedder()
+    if isinstance(active, ProcessPoolEmbedder):
+        active.warm_up()
+    query_vec = active.encode(["warm up"])[0]
+    get_qdrant_client().query_points(collection_name=COLLECTION_NAME, query=query_vec.tolist(), limit=1)
+    get_index_version()
+    if RERANKER_MODEL_NAME:
+        predict_rerank_scores("warm up", ["warm up"])
 
 
 class QdrantCodeRetriever:
+    def __init__(
+        self,
+        use_reranker: bool = True,
+        adaptive_top_k: bool = RETRIEVAL_ADAPTIVE_TOP_K,
+        expand_graph: bool = RETRIEVAL_GRAPH_EXPANSION,
+        compact: bool = PROMPT_COMPACTION,
+    ):
+        self.use_reranker = use_reranker and bool(RERANKER_MODEL_NAME)
+        self.adaptive_top_k = adaptive_top_k
+        self.expand_graph = expand_graph
+        self.compact = compact
+
     def retrieve(self, query: str, top_k: int = 30) -> str:
-        query_vec = emb_model.encode([query], normalize_embeddings=True)[0]
-        
-        response = emb_client.query_points(
-            collection_name=COLLECTION_NAME,
+        return self.retrieve_context(query, top_k=top_k).text
+
+    def retrieve_context(self, query: str, top_k: int = 30) -> RetrievedContext:
+        """The formatted context, with the scores of the ranked chunks for routing the turn."""
+        query_vec = get_embedder().encode([query])[0]
+        limit = RETRIEVAL_CANDIDATE_MULTIPLIER * top_k
+        if self.use_reranker:
+            limit = max(limit, RERANK_CANDIDATES)
+        raw_results = self.search(query_vec, limit=limit)
+        ranked = self.rank(query, raw_results)
+        if self.use_reranker:
+            ranked = self.rerank(query, ranked)
+        cut, reason = self.select(ranked, max_k=top_k)
+        # Without adaptive_top_k the cut is only logged, to tune its thresholds on real traffic.
+        selected = cut if self.adaptive_top_k else ranked[:top_k]
+        linked = self.expand(selected)
+        scores = [self.rank_score(res) for res in ranked]
+        log_usage_metric("retrieval_cutoff", {
+            "chosen_k": len(cut),
+            "sent_k": len(selected),
+            "applied": self.adaptive_top_k,
+            "max_k": top_k,
+            "min_k": RETRIEVAL_MIN_TOP_K,
+            "candidates": len(ranked),
+            "reason": reason,
+            "reranked": self.use_reranker,
+            "index_version": get_index_version(),
+            "kept_scores": [round(score, 4) for score in scores[:len(cut)]],
+            "truncated_scores": [round(score, 4) for score in scores[len(cut):len(cut) + RETRIEVAL_LOG_TAIL]],
+            "graph_linked": len(linked),
+        }, filename=METRICS_FILE)
+        return self.to_context(selected, linked)
+
+    def to_context(self, selected: List[Dict], linked: List[Dict]) -> RetrievedContext:
+        # Scores are only comparable on one scale: chunks the reranker had no time for are left out.
+        reranked = bool(selected) and "rerank_score" in selected[0]
+        scores = [self.rank_score(res) for res in selected if ("rerank_score" in res) == reranked]
+        return RetrievedContext(
+            text=self.format_results(self.compact_results(selected + linked)),
+            scores=scores,
+            linked_chunks=len(linked),
+            reranked=reranked,
+        )
+
+    @staticmethod
+    def rank_score(res: Dict) -> float:
+        """The score the final ordering was based on; reranker scores as probabilities."""
+        if "rerank_score" in res:
+            score = res["rerank_score"]
+            return 1.0 / (1.0 + math.exp(-score)) if RERANK_SCORES_ARE_LOGITS else score
+        return res.get("boosted_score", res["score"])
+
+    def select(
+        self,
+        ranked: List[Dict],
+        max_k: int,
+        min_k: int = RETRIEVAL_MIN_TOP_K,
+        relative_cutoff: Optional[float] = None,
+        absolute_floor: Optional[float] = None,
+        budget_chars: int = RETRIEVAL_CONTEXT_BUDGET_CHARS,
+    ) -> Tuple[List[Dict], str]:
+        """Cut the ranked list where scores fall off or the context budget runs out.
+
+        The thresholds default to the RERANK_* ones for a reranked list and the RETRIEVAL_*
+        ones for dense scores. Returns the kept chunks and the reason the list stopped there.
+        """
+        if not ranked:
+            return [], "no_candidates"
+
+        best = self.rank_score(ranked[0])
+        reranked = "rerank_score" in ranked[0]
+        if relative_cutoff is None:
+            relative_cutoff = RERANK_RELATIVE_SCORE_CUTOFF if reranked else RETRIEVAL_RELATIVE_SCORE_CUTOFF
+        if absolute_floor is None:
+            absolute_floor = RERANK_ABSOLUTE_SCORE_FLOOR if reranked else RETRIEVAL_ABSOLUTE_SCORE_FLOOR
+        used_chars = 0
+        for index, res in enumerate(ranked[:max_k]):
+            used_chars += len(res["content"]) + len(res["path"]) + 200  # Header and fences
+            if index < min_k:
+                continue
+            if reranked and "rerank_score" not in res:
+                return ranked[:index], "rerank_budget"
+            score = self.rank_score(res)
+            if score < absolute_floor:
+                return ranked[:index], "absolute_floor"
+            if score < best * relative_cutoff:
+                return ranked[:index], "relative_cutoff"
+            if used_chars > budget_chars:
+                return ranked[:index], "context_budget"
+
+        if len(ranked) <= max_k:
+            return ranked, "no_more_candidates"
+        return ranked[:max_k], "max_k"
+
+    def expand(self, selected: List[Dict]) -> List[Dict]:
+        """Chunks the top results extend, reference or call, one hop along the code graph.
+
+        Neighbors are fetched by point id from the index version the graph was built for
+        (its chunk store when there is one), so this costs one lookup and no extra vector
+        search. Stays within the context budget.
+        """
+        if not self.expand_graph or not selected:
+            return []
+        collection = get_index_version() or COLLECTION_NAME
+        graph = get_code_graph(collection)
+        if graph is None:
+            return []
+
+        seeds = [res["id"] for res in selected[:RETRIEVAL_GRAPH_SEEDS]]
+        links = graph.expand(seeds, exclude={res["id"] for res in selected}, limit=RETRIEVAL_GRAPH_MAX_NEIGHBORS)
+        if not links:
+            return []
+        store = get_chunk_store(collection)
+        if store is not None:
+            by_id = {target: self.payload_to_result(target, None, store[target]) for target, _, _ in links}
+        else:
+            records = get_qdrant_client().retrieve(
+                collection_name=collection, ids=[target for target, _, _ in links], with_payload=True
+            )
+            by_id = {record.id: self.hit_to_result(record) for record in records}
+        seed_paths = {res["id"]: res["path"] for res in selected}
+
+        used_chars = sum(len(res["content"]) + len(res["path"]) + 200 for res in selected)
+        linked = []
+        for target, seed, kind in links:
+            if target not in by_id:
+                continue
+            res = by_id[target]
+            used_chars += len(res["content"]) + len(res["path"]) + 200
+            if used_chars > RETRIEVAL_CONTEXT_BUDGET_CHARS:
+                break
+            res["linked_from"] = seed_paths[seed]
+            res["relation"] = EDGE_KINDS[kind]
+            linked.append(res)
+        return linked
+
+    def compact_results(self, results: List[Dict]) -> List[Dict]:
+        """Compact the Java in the results that go into the prompt, and log the savings.
+
+        The top PROMPT_COMPACTION_FULL_CHUNKS results keep their method bodies; lower-ranked
+        and graph-linked chunks have them elided. Compacted text is cached per chunk.
+        """
+        if not self.compact or not results:
+            return results
+        before = after = tokens_before = tokens_after = elided = 0
+        for rank, res in enumerate(results):
+            if not res["path"].endswith(".java"):
+                continue
+            elide = rank >= PROMPT_COMPACTION_FULL_CHUNKS or "linked_from" in res
+            compacted = compact_java(res["content"], first_line_number(res["lines_info"]), elide)
+            before += len(res["content"])
+            after += len(compacted)
+            tokens_before += estimate_tokens(res["content"])
+            tokens_after += estimate_tokens(compacted)
+            elided += elide
+            res["content"] = compacted
+        log_usage_metric("prompt_compaction", {
+            "chunks": len(results),
+            "elided_chunks": elided,
+            "chars_before": before,
+            "chars_after": after,
+            "est_tokens_before": tokens_before,
+            "est_tokens_after": tokens_after,
+            "est_tokens_saved": tokens_before - tokens_after,
+        }, filename=METRICS_FILE)
+        return results
+
+    def search(self, query_vec, limit: int) -> List[Dict]:
+        """First-stage dense search, returned in Qdrant's score order.
+
+        When the live index version has a chunk store, Qdrant only returns ids and scores
+        and the chunks are read from the memory-mapped store. That version is queried
+        directly rather than through the alias, so the ids always match the store.
+        """
+        version = get_index_version()
+        store = get_chunk_store(version)
+        response = get_qdrant_client().query_points(
+            collection_name=COLLECTION_NAME if store is None else version,
             query=query_vec.tolist(),
-            limit=3 * top_k,
+            limit=limit,
+            with_payload=store is None,
         )
-        
-        hits = response.points
-        
-        raw_results = []
-        for hit in hits:
-            payload = hit.payload
-            lines_info = payload["metadata"].get("lines", "full file")
-            raw_results.append({
-                "score": hit.score,
-                "path": payload['path'],
-                "lines_info": lines_info,
-                "content": payload['content'],
-                "metadata": payload.get("metadata", {}),
-                "class_names": payload.get("class_names", []),
-                "method_names": payload.get("method_names", []),
-            })
+        return [self.hit_to_result(hit, store) for hit in response.points]
+
+    @classmethod
+    def hit_to_result(cls, hit, store=None) -> Dict:
+        """Result for a Qdrant point; its chunk comes from `store` when given, else the payload."""
+        payload = store[int(hit.id)] if store is not None else hit.payload
+        # Records fetched by id have no score.
+        return cls.payload_to_result(hit.id, getattr(hit, "score", None), payload)
+
+    @staticmethod
+    def payload_to_result(point_id, score: Optional[float], payload: Dict) -> Dict:
+        return {
+            "id": point_id,
+            "score": score,
+            "path": payload['path'],
+            "lines_info": payload["metadata"].get("lines", "full file"),
+            "content": payload['content'],
+            "metadata": payload.get("metadata", {}),
+            "class_names": payload.get("class_names", []),
+            "method_names": payload.get("method_names", []),
+            "alias_paths": payload.get("alias_paths", []),
+        }
 
+    def rank(self, query: str, raw_results: List[Dict], keyword_boost: float = RETRIEVAL_KEYWORD_BOOST) -> List[Dict]:
+        """Order candidates by dense score plus a boost for each query keyword they contain."""
         keywords = self._extract_keywords(query)
-        if keywords:
-            for res in raw_results:
-                boost = 0.0
-                text = (res["path"].lower() + " " + 
-                        " ".join(res["class_names"]).lower() + " " + 
-                        " ".join(res["method_names"]).lower() + " " + 
-                        res["content"].lower())
-                
-                for kw in keywords:
-                    if kw.lower() in text:
-                        boost += 0.15
-                
-                res["boosted_score"] = res["score"] + boost * 0.3
-            
-            raw_results.sort(key=lambda x: x.get("boosted_score", x["score"]), reverse=True)
-        else:
-            raw_results.sort(key=lambda x: x["score"], reverse=True)
+        if not keywords:
+            return sorted(raw_results, key=lambda x: x["score"], reverse=True)
+
+        for res in raw_results:
+            boost = keyword_boost * self.keyword_hits(keywords, res)
+            res["boosted_score"] = res["score"] + boost * RETRIEVAL_BOOST_WEIGHT
+        return sorted(raw_results, key=lambda x: x["boosted_score"], reverse=True)
+
+    def rerank(self, query: str, ranked: List[Dict], time_budget: float = RERANK_TIME_BUDGET_SECONDS) -> List[Dict]:
+        """Reorder the top first-stage candidates with the cross-encoder, batch by batch.
+
+        The first batch is always scored; later batches only start within the time budget.
+        Candidates left unscored follow the reranked ones in their first-stage order.
+        """
+        candidates = ranked[:RERANK_CANDIDATES]
+        deadline = time.perf_counter() + time_budget
+        scored = []
+        for start in range(0, len(candidates), RERANK_BATCH_SIZE):
+            if scored and time.perf_counter() > deadline:
+                break
+            batch = candidates[start:start + RERANK_BATCH_SIZE]
+            texts = [f"{res['path']}\n{res['content'][:RERANK_MAX_CHARS]}" for res in batch]
+            scores = predict_rerank_scores(query, texts)
+            for res, score in zip(batch, scores):
+                res["rerank_score"] = float(score)
+            scored.extend(batch)
+
+        scored.sort(key=lambda x: x["rerank_score"], reverse=True)
+        return scored + ranked[len(scored):]
 
+    @staticmethod
+    def keyword_hits(keywords: List[str], res: Dict) -> int:
+        text = (res["path"].lower() + " " +
+                " ".join(res.get("alias_paths", [])).lower() + " " +
+                " ".join(res["class_names"]).lower() + " " +
+                " ".join(res["method_names"]).lower() + " " +
+                res["content"].lower())
+        return sum(1 for kw in keywords if kw.lower() in text)
+
+    @staticmethod
+    def format_results(ranked: List[Dict]) -> str:
         results = []
-        for res in raw_results[:top_k]:
+        for res in ranked:
             lines_info = res["lines_info"]
-            header = (
-                f"File: {res['path']} (lines {lines_info})\n"
-                f"Relevance: {res['score']:.3f}"
-            )
+            header = f"File: {res['path']} (lines {lines_info})\n"
+            if "linked_from" in res:
+                header += f"Linked: {res['linked_from']} {res['relation']} this"
+            else:
+                header += f"Relevance: {res['score']:.3f}"
             if "boosted_score" in res and abs(res["boosted_score"] - res["score"]) > 0.01:
                 header += f"  (boosted: {res['boosted_score']:.3f})"
-            
+            if "rerank_score" in res:
+                header += f"  (reranked: {res['rerank_score']:.3f})"
+            aliases = res.get("alias_paths", [])
+            if aliases:
+                # Near-identical copies were merged at ingest; the model should still know about them.
+                shown = ", ".join(aliases[:RETRIEVAL_MAX_ALIAS_PATHS])
+                more = len(aliases) - RETRIEVAL_MAX_ALIAS_PATHS
+                header += f"\nAlso at: {shown}" + (f" (+{more} more)" if more > 0 else "")
+
             results.append(
                 f"{header}\n"
                 f"Classes: {', '.join(res['class_names']) if res['class_names'] else '—'}\n"
                 f"Methods: {', '.join(res['method_names']) if res['method_names'] else '—'}\n"
                 f"```\n{res['content']}\n```"
             )
-        
+
         return "\n\n".join(results) if results else "No relevant code found."
 
     @staticmethod
@@ -82,23 +537,35 @@ def _extract_keywords(query: str) -> List[str]:
 
 
 class ContextCapturingRetriever:
-    '''A retriever that remembers the retrieved context. Used for evaluation of the RAG pipeline'''
+    '''A retriever that remembers the retrieved context. Used for evaluation of the RAG pipeline.
+
+    The captured context is kept per thread, so concurrent turns running in different
+    worker threads do not overwrite each other. Call get_captured_context() from the same
+    thread that ran the turn.
+    '''
     def __init__(self, base_retriever: QdrantCodeRetriever):
         self.base_retriever = base_retriever
-        self.last_retrieved_context: str = ""
+        self._local = threading.local()
+
+    @property
+    def last_retrieved_context(self) -> str:
+        return getattr(self._local, "context", "")
 
     def retrieve(self, query: str, **kwargs) -> str:
+        return self.retrieve_context(query, **kwargs).text
+
+    def retrieve_context(self, query: str, **kwargs) -> RetrievedContext:
         if self.last_retrieved_context:
             raise ValueError(
                 "Previous retrieved contexts not cleared. "
-                "Call get_all_captured_contexts() after each turn to reset."
+                "Call get_captured_context() after each turn to reset."
             )
-        docs = self.base_retriever.retrieve(query, **kwargs)
-        self.last_retrieved_context = docs
-        return docs
+        retrieved = self.base_retriever.retrieve_context(query, **kwargs)
+        self._local.context = retrieved.text
+        return retrieved
 
     def get_captured_context(self) -> str:
-        """Flatten and return the last capture context then clear."""
+        """Return the last context captured in this thread, then clear it."""
         context = self.last_retrieved_context
-        self.last_retrieved_context = ""
+        self._local.context = ""
         return context
\ No newline at end of file
@@ -1,9 +1,38 @@
 # application.py
-from typing import List, Dict
+import re
+import time
+from typing import List, Dict, Optional, Tuple
 
-from src.domain.ports import LLMCompleter, CodeRetriever
+from src.domain.ports import LLMCompleter, CodeRetriever, RetrievedContext
 from src.domain.prompts import system_prompt
-from src.config import MAX_HISTORY_MESSAGES, HISTORY_KEEP_LAST
+from src.config import (
+    MAX_HISTORY_MESSAGES,
+    HISTORY_KEEP_LAST,
+    RERANKER_MODEL_NAME,
+    RETRIEVAL_RERANKED_TOP_K,
+    RETRIEVAL_FIRST_TOP_K,
+    RETRIEVAL_USUAL_TOP_K,
+    LLM_MODEL,
+    LLM_FAST_MODEL,
+    LLM_ROUTING_MAX_QUERY_WORDS,
+    LLM_ROUTING_MAX_CONTEXT_CHARS,
+    LLM_ROUTING_MAX_CHUNKS,
+    LLM_ROUTING_MIN_SCORE_MARGIN,
+    LLM_ROUTING_MIN_RERANK_MARGIN,
+    METRICS_FILE,
+)
+from src.utils import log_usage_metric
+
+# Questions that ask where something is or what it looks like...
+LOOKUP_PATTERN = re.compile(
+    r"\b(where (is|are|does|do)|which (file|class|method|package)|what (file|class|package)|"
+    r"defined|definition|declared|signature|find|list (the|all))\b"
+)
+# ...versus questions that need reasoning across the code.
+REASONING_PATTERN = re.compile(
+    r"\b(why|how (does|do|is|are|can|should|would|to)|explain|design|architecture|walk me through|"
+    r"compare|difference|relationship|interact|flow|lifecycle|implement|refactor|debug|trade-?offs?)\b"
+)
 
 
 def get_initial_history() -> List[Dict]:
@@ -11,8 +40,52 @@ def get_initial_history() -> List[Dict]:
 
 
 def get_retrieval_top_k(history: List[Dict]) -> int:
-    """Return the number of retrieval results to use based on conversation stage"""
-    return 50 if len(history) == 1 else 50
+    """Return the upper bound on retrieval results based on conversation stage.
+
+    With RETRIEVAL_ADAPTIVE_TOP_K the retriever may send fewer when scores fall off.
+    """
+    if RERANKER_MODEL_NAME:
+        # Cross-encoder ordering is reliable enough to send far fewer chunks.
+        return RETRIEVAL_RERANKED_TOP_K
+    return RETRIEVAL_FIRST_TOP_K if len(history) == 1 else RETRIEVAL_USUAL_TOP_K
+
+
+def route_turn(current_history: List[Dict], query: str, retrieved: RetrievedContext) -> Tuple[str, str, Dict]:
+    """Pick the model for a turn from cheap features of the query and the retrieved context.
+
+    Returns (route, model, features). A turn goes to LLM_FAST_MODEL only when it reads as a
+    lookup, not as a reasoning question, and the context is small and focused: one or two
+    chunks clearly ahead of the rest, and few graph-linked chunks around them.
+    """
+    lowered = query.lower()
+    scores = retrieved.scores
+    margin = LLM_ROUTING_MIN_RERANK_MARGIN if retrieved.reranked else LLM_ROUTING_MIN_SCORE_MARGIN
+    close_chunks = sum(1 for score in scores if score > scores[0] - margin) if scores else 0
+    features = {
+        "query_words": len(query.split()),
+        "identifiers": len(re.findall(r"\b[A-Z][a-z0-9]+[A-Z]\w*|\b[a-z]+[A-Z]\w*", query)),
+        "lookup": bool(LOOKUP_PATTERN.search(lowered)),
+        "reasoning": bool(REASONING_PATTERN.search(lowered)),
+        "follow_up": len(current_history) > 1,
+        "context_chunks": len(scores) + retrieved.linked_chunks,
+        "linked_chunks": retrieved.linked_chunks,
+        "close_chunks": close_chunks,
+        "context_chars": len(retrieved.text),
+        "reranked": retrieved.reranked,
+        "score_margin": round(scores[0] - scores[1], 3) if len(scores) > 1 else None,
+    }
+    focused = 0 < close_chunks + retrieved.linked_chunks <= LLM_ROUTING_MAX_CHUNKS
+    fast = (
+        LLM_FAST_MODEL is not None
+        and features["lookup"]
+        and not features["reasoning"]
+        and features["query_words"] <= LLM_ROUTING_MAX_QUERY_WORDS
+        and features["context_chars"] <= LLM_ROUTING_MAX_CONTEXT_CHARS
+        and focused
+    )
+    if fast:
+        return "fast", LLM_FAST_MODEL, features
+    return "reasoning", LLM_MODEL, features
 
 
 def complete_conversation_turn(
@@ -20,12 +93,13 @@ def complete_conversation_turn(
     query: str,
     context: str,
     completer: LLMCompleter,
+    model: Optional[str] = None,
 ) -> tuple[str, List[Dict], bool]:
     user_content = f"More code context:\n{context}\n\nQuestion: {query}"
 
     provisional_history = current_history + [{"role": "user", "content": user_content}]
 
-    response = completer.complete(provisional_history)
+    response = completer.complete(provisional_history, model=model)
 
     new_history = current_history + [{"role": "user", "content": f"\nQuestion: {query}"}] + [{"role": "assistant", "content": response}] # Don't bloat the history with every context
 
@@ -42,5 +116,22 @@ def process_conversation_turn(
     completer: LLMCompleter,
 ) -> tuple[str, List[Dict], bool]:
     top_k = get_retrieval_top_k(current_history)
-    context = retriever.retrieve(query, top_k=top_k)
-    return complete_conversation_turn(current_history, query, context, completer)
+    retrieved = retriever.retrieve_context(query, top_k=top_k)
+    context = retrieved.text
+
+    route, model, features = route_turn(current_history, query, retrieved)
+    started = time.perf_counter()
+    success = False
+    try:
+        result = complete_conversation_turn(current_history, query, context, completer, model=model)
+        success = True
+        return result
+    finally:
+        # Joined with the llm_completion metric (tokens, cost) to tune the routing thresholds.
+        log_usage_metric("model_route", {
+            "route": route,
+            "model": model,
+            "features": features,
+            "duration_seconds": round(time.perf_counter() - started, 3),
+            "success": success,
+        }, filename=METRICS_FILE)
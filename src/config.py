@@ -1,19 +1,129 @@
 import os
 
 QDRANT_URL = os.getenv("QDRANT_URL")
-COLLECTION_NAME = "hytale_codebase"
+COLLECTION_NAME = "hytale_codebase"  # Alias pointing at the live versioned collection (see rag_setup/index_versions.py)
+COLLECTION_VERSIONS_KEPT = 2  # Versioned collections kept after a rebuild, including the live one
+INDEX_VERSION_TTL_SECONDS = 60  # How long the retriever caches which collection the alias points to
+INDEX_VERSIONS_CACHED = 2  # Versions whose chunk store and code graph stay loaded: the live one and the one before
 EMBEDDING_MODEL_NAME = "mixedbread-ai/mxbai-embed-large-v1"
+# Memory-mapped chunk stores, one <collection>/ directory per versioned collection. When the
+# live version has one, the retriever reads chunk content from it and Qdrant returns only ids
+# and scores.
+CHUNK_STORE_DIR = os.getenv("CHUNK_STORE_DIR", "data/chunk_store")
 
-RETRIEVAL_FIRST_TOP_K = 30
-RETRIEVAL_USUAL_TOP_K = 30
+# Snapshot export/import (scripts/qdrant_export.py, scripts/qdrant_import.py).
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "data/snapshots")
+# SNAPSHOT_DIR as the Qdrant server sees it (docker-compose mounts it at /snapshots), used to
+# restore by file:// location when uploading the snapshot fails.
+QDRANT_SNAPSHOT_DIR = os.getenv("QDRANT_SNAPSHOT_DIR", "/snapshots")
+
+# Optional shared embedding server (`python main.py embedding-server`). When the URL is set,
+# the retriever sends texts there instead of loading its own copy of the model.
+EMBEDDING_SERVER_URL = os.getenv("EMBEDDING_SERVER_URL")
+EMBEDDING_SERVER_HOST = os.getenv("EMBEDDING_SERVER_HOST", "127.0.0.1")
+EMBEDDING_SERVER_PORT = int(os.getenv("EMBEDDING_SERVER_PORT", "8100"))
+EMBEDDING_SERVER_MAX_BATCH = 32  # Texts encoded together across concurrent requests
+EMBEDDING_SERVER_MAX_WAIT_MS = 5  # How long the first request in a batch waits for others to join
+EMBEDDING_SERVER_TIMEOUT_SECONDS = 30
+
+# Worker processes for query encoding and reranking (0 = run in the calling process).
+# Each worker holds its own copy of the models; ignored when EMBEDDING_SERVER_URL is set.
+RETRIEVAL_WORKER_PROCESSES = int(os.getenv("RETRIEVAL_WORKER_PROCESSES", "0"))
+RETRIEVAL_WORKER_TORCH_THREADS = 1  # Intra-op threads per worker, so workers don't oversubscribe cores
+
+RETRIEVAL_FIRST_TOP_K = 50  # Upper bound on chunks for the first turn of a conversation
+RETRIEVAL_USUAL_TOP_K = 50  # Upper bound on chunks for follow-up turns
+RETRIEVAL_CANDIDATE_MULTIPLIER = 3  # Dense candidates fetched per returned chunk, before keyword boosting
+RETRIEVAL_KEYWORD_BOOST = 0.15  # Added per query keyword found in a candidate's path, symbols or content
+RETRIEVAL_BOOST_WEIGHT = 0.3  # Scale applied to the summed keyword boost
+
+# Optional cross-encoder reranking after the dense search, e.g. "cross-encoder/ms-marco-MiniLM-L-6-v2".
+# Unset disables reranking.
+RERANKER_MODEL_NAME = os.getenv("RERANKER_MODEL_NAME")
+RERANK_CANDIDATES = 40  # Top first-stage candidates handed to the cross-encoder
+RERANK_MAX_CHARS = 2000  # Chunk text is truncated to this before scoring
+RERANK_BATCH_SIZE = 16
+RERANK_TIME_BUDGET_SECONDS = 1.5  # No new batch starts after this; unscored candidates keep first-stage order
+RETRIEVAL_RERANKED_TOP_K = 10
+# Reranker scores are cut on a probability scale: raw logits (what ms-marco cross-encoders
+# return) go through a sigmoid first. Set False for rerankers that already return probabilities.
+RERANK_SCORES_ARE_LOGITS = True
+
+# Adaptive cut-off: after ranking, chunks are kept while they stay close to the best hit.
+# Scores are the ones the ranking used: the boosted dense (cosine) score, or the reranker's
+# relevance probability when reranked, each with its own thresholds.
+# Off until the retrieval_cutoff metrics back these thresholds: the cut is then only computed
+# and logged, and the full top_k is sent.
+RETRIEVAL_ADAPTIVE_TOP_K = False
+RETRIEVAL_MIN_TOP_K = 5  # Always kept, whatever the scores or the budget
+RETRIEVAL_RELATIVE_SCORE_CUTOFF = 0.8  # Stop below this fraction of the best score
+RETRIEVAL_ABSOLUTE_SCORE_FLOOR = 0.3  # Stop below this score
+RERANK_RELATIVE_SCORE_CUTOFF = 0.25  # Reranked: stop below this fraction of the best probability
+RERANK_ABSOLUTE_SCORE_FLOOR = 0.05  # Reranked: stop below this probability
+RETRIEVAL_CONTEXT_BUDGET_CHARS = 240000  # Stop before the formatted context would exceed this
+RETRIEVAL_LOG_TAIL = 20  # Scores of the first dropped chunks logged per request
+RETRIEVAL_MAX_ALIAS_PATHS = 10  # Paths of merged duplicates listed under a chunk's header
+
+# One-hop expansion along the code graph built at ingest (rag_setup/code_graph.py): chunks the
+# top results extend, reference or call are fetched by id and appended to the context.
+CODE_GRAPH_DIR = "data/code_graph"  # One <collection>.npz per versioned collection
+RETRIEVAL_GRAPH_EXPANSION = False
+RETRIEVAL_GRAPH_SEEDS = 5  # Top results whose neighbors are considered
+RETRIEVAL_GRAPH_MAX_NEIGHBORS = 5  # Linked chunks added at most
+
+# Prompt-side compaction of retrieved Java (src/adapters/compaction.py): license headers,
+# import blocks, VineFlower comments, blank runs and indentation are squeezed out of the
+# context, with `// L<n>` markers so line-number citations stay exact.
+PROMPT_COMPACTION = True
+PROMPT_COMPACTION_INDENT = 1  # Spaces per indentation level in compacted code
+PROMPT_COMPACTION_FULL_CHUNKS = 8  # Top results shown with method bodies; later and linked ones get them elided
+PROMPT_COMPACTION_CACHE_SIZE = 4096  # Compacted chunks kept in memory
 
 LLM_ENVIRONMENT_KEY_NAME="LITELLM_MASTER_KEY"
 LLM_BASE_URL = os.getenv("LITELLM_API_BASE")
 LLM_MODEL = "grok-4-1-fast-reasoning"
+LLM_REQUEST_TIMEOUT_SECONDS = 180.0  # Deadline for a whole completion, hedge included
+LLM_CONNECT_TIMEOUT_SECONDS = 5.0
+LLM_MAX_CONNECTIONS = 32  # Pooled connections to the LiteLLM proxy
+LLM_MAX_KEEPALIVE_CONNECTIONS = 16
+LLM_KEEPALIVE_EXPIRY_SECONDS = 60.0
+
+# Hedged requests: if LLM_MODEL is slower than this percentile of its recent latencies,
+# the same request also goes to LLM_HEDGE_MODEL and the first answer wins. None disables it.
+LLM_HEDGE_MODEL = "gpt-5-mini"
+LLM_HEDGE_PERCENTILE = 95
+LLM_HEDGE_WINDOW = 200  # Recent primary latencies the percentile is taken over
+LLM_HEDGE_MIN_SAMPLES = 20  # Below this many samples the default delay is used
+LLM_HEDGE_DEFAULT_DELAY_SECONDS = 45.0
+LLM_HEDGE_MIN_DELAY_SECONDS = 5.0
+
+# Model routing: short lookups with a focused context go to LLM_FAST_MODEL, everything else
+# to LLM_MODEL. Both must be listed in litellm-config.yaml. None disables routing.
+LLM_FAST_MODEL = "gpt-5-mini"
+LLM_ROUTING_MAX_QUERY_WORDS = 25
+LLM_ROUTING_MAX_CONTEXT_CHARS = 60000
+# A focused context has at most this many chunks close to the best one, counting graph-linked
+# chunks too. "Close" means within the margin below, on the scale the list was ranked by.
+LLM_ROUTING_MAX_CHUNKS = 3
+LLM_ROUTING_MIN_SCORE_MARGIN = 0.08  # Dense (boosted cosine) scores
+LLM_ROUTING_MIN_RERANK_MARGIN = 0.2  # Reranker probabilities
+
+# USD per million (input, output) tokens, for the cost estimate in llm_completion metrics.
+# Output includes reasoning tokens. Keep in line with the vendors' price lists.
+LLM_PRICES_PER_MILLION_TOKENS = {
+    "grok-4-1-fast-reasoning": (0.20, 0.50),
+    "gpt-5-mini": (0.25, 2.00),
+    "kimi-2.5": (0.50, 2.80),
+}
 
 DISCORD_COMMAND_PREFIX = "!"
 MAX_HISTORY_MESSAGES = 12
 HISTORY_KEEP_LAST = 8
-MESSAGE_CHUNK_LIMIT = 1800
+DISCORD_MESSAGE_LIMIT = 2000  # Discord's hard limit per message
+DISCORD_MAX_INLINE_MESSAGES = 4  # Longer answers continue in an attached answer.md
+DISCORD_CHANNEL_RATE_LIMIT = 5  # Sends per channel per window before Discord starts answering 429
+DISCORD_CHANNEL_RATE_WINDOW_SECONDS = 5.0
+WARMUP_QUEUE_TIMEOUT_SECONDS = 120  # How long !hy waits for start-up warm-up before asking to retry
 
-METRICS_FILE = "data/usage_metrics.jsonl"
+METRICS_FILE = os.getenv("METRICS_FILE", "data/usage_metrics.jsonl")
+METRICS_INDEX_FILE = "data/usage_metrics.sqlite"  # Built by scripts/metrics_report.py
@@ -1,9 +1,18 @@
 # ports.py
+from dataclasses import dataclass, field
 from typing import Protocol
-from typing import List, Dict
+from typing import List, Dict, Optional
+
+@dataclass
+class RetrievedContext:
+    text: str  # Formatted for the prompt
+    scores: List[float] = field(default_factory=list)  # Ranked chunks' scores on the final ranking scale, best first
+    linked_chunks: int = 0  # Graph-linked chunks added after the ranked ones
+    reranked: bool = False  # Scores are cross-encoder probabilities rather than dense similarities
 
 class LLMCompleter(Protocol):
-    def complete(self, messages: List[Dict]) -> str: ...
+    def complete(self, messages: List[Dict], model: Optional[str] = None) -> str: ...
 
 class CodeRetriever(Protocol):
-    def retrieve(self, query: str, top_k: int = 20) -> str: ...
\ No newline at end of file
+    def retrieve(self, query: str, top_k: int = 20) -> str: ...
+    def retrieve_context(self, query: str, top_k: int = 20) -> RetrievedContext: ...
\ No newline at end of file
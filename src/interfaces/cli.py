@@ -1,8 +1,9 @@
 # cli.py
 import sys
+import threading
 import traceback
 
-from src.adapters.retrieval import QdrantCodeRetriever
+from src.adapters.retrieval import QdrantCodeRetriever, warm_up
 from src.application.application import get_initial_history, process_conversation_turn
 from src.adapters.llm import get_llm_completer
 
@@ -10,7 +11,19 @@
 code_retriever = QdrantCodeRetriever()
 llm_completer = get_llm_completer()
 
+
+def warm_up_in_background():
+    try:
+        warm_up()
+    except Exception:
+        print("\nRetrieval warm-up failed; the first question will retry loading.")
+        traceback.print_exc()
+
+
 def main():
+    # Load the embedding model while the user types the first question.
+    threading.Thread(target=warm_up_in_background, daemon=True).start()
+
     print("Hytale Modding Assistant CLI")
     print("Type your question about the Hytale server codebase.")
     print("Commands: /clear (reset conversation), /exit (quit)")
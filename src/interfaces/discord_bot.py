@@ -1,32 +1,146 @@
 # discord_bot.py
 import asyncio
+import io
 import time
 import traceback
+from collections import deque
 
 import discord
 from discord.ext import commands
 
-from src.adapters.retrieval import QdrantCodeRetriever
+from src.adapters.retrieval import QdrantCodeRetriever, warm_up
 from src.adapters.llm import get_llm_completer
 from src.application.application import get_initial_history, process_conversation_turn
-from src.utils import split_into_messages, log_usage_metric, anonymize_user_id
+from src.utils import split_into_messages, remaining_text, log_usage_metric, anonymize_user_id
 
 from src.config import (
     DISCORD_COMMAND_PREFIX,
-    MESSAGE_CHUNK_LIMIT,
+    DISCORD_MESSAGE_LIMIT,
+    DISCORD_MAX_INLINE_MESSAGES,
+    DISCORD_CHANNEL_RATE_LIMIT,
+    DISCORD_CHANNEL_RATE_WINDOW_SECONDS,
     METRICS_FILE,
+    WARMUP_QUEUE_TIMEOUT_SECONDS,
 )
 
+PROCESS_START_TIME = time.time()
+
 intents = discord.Intents.default()
 intents.message_content = True
 
 bot = commands.Bot(command_prefix=DISCORD_COMMAND_PREFIX, intents=intents, help_command=None)
 
 histories: dict[int, list[dict]] = {}
+channel_sends: dict[int, deque] = {}  # Recent send times per channel, for the rate-limit budget
 
 code_retriever = QdrantCodeRetriever()
 llm_completer = get_llm_completer()
 
+# The embedding model and Qdrant connection load in the background after startup;
+# commands arriving before that wait on this event instead of paying the load themselves.
+retrieval_ready = asyncio.Event()
+retrieval_state = "starting"
+_warmup_task = None
+
+
+async def warm_up_retrieval():
+    global retrieval_state
+    start_time = time.time()
+    retrieval_state = "warming"
+    details = {}
+    try:
+        await asyncio.to_thread(warm_up)
+        retrieval_state = "ready"
+    except Exception as exc:
+        # Commands still run and load lazily; they will report their own errors.
+        retrieval_state = "failed"
+        details["error_reason"] = type(exc).__name__
+        traceback.print_exc()
+    finally:
+        retrieval_ready.set()
+
+    log_usage_metric("retrieval_warmup", {
+        "state": retrieval_state,
+        "duration_seconds": round(time.time() - start_time, 3),
+        "seconds_since_process_start": round(time.time() - PROCESS_START_TIME, 3),
+        **details,
+    }, filename=METRICS_FILE)
+    print(f"Retrieval warm-up finished ({retrieval_state}) in {time.time() - start_time:.1f}s")
+
+
+def send_budget(channel_id: int) -> int:
+    """How many more messages the channel can take before hitting Discord's rate limit."""
+    now = time.monotonic()
+    sends = channel_sends.setdefault(channel_id, deque())
+    while sends and now - sends[0] > DISCORD_CHANNEL_RATE_WINDOW_SECONDS:
+        sends.popleft()
+    return max(0, DISCORD_CHANNEL_RATE_LIMIT - len(sends))
+
+
+async def send_counted(ctx: commands.Context, content: str = None, **kwargs):
+    """ctx.send, recorded against the channel's rate-limit budget. Every send goes through here."""
+    channel_sends.setdefault(ctx.channel.id, deque()).append(time.monotonic())
+    return await ctx.send(content, **kwargs)
+
+
+async def deliver_response(ctx: commands.Context, thinking_msg, response: str, notice: str = None) -> dict:
+    """Send an answer in as few API calls as the channel's rate-limit budget allows.
+
+    The first chunk replaces the "Processing..." message. Up to DISCORD_MAX_INLINE_MESSAGES
+    chunks are sent as messages; whatever does not fit in that or in the channel's current
+    budget goes to a single answer.md attachment. `notice` is appended to the last message.
+    """
+    start_time = time.time()
+    chunks = split_into_messages(response, limit=DISCORD_MESSAGE_LIMIT)
+
+    # Messages after the edited one, keeping one send for the attachment if needed.
+    extra_sends = min(DISCORD_MAX_INLINE_MESSAGES - 1, send_budget(ctx.channel.id))
+    inline = 1 + extra_sends if len(chunks) - 1 <= extra_sends else max(1, extra_sends)
+    inline = min(inline, len(chunks))
+    for index, chunk in enumerate(chunks[:inline]):
+        if len(chunk) > DISCORD_MESSAGE_LIMIT:  # A single over-long line; only a file can carry it
+            inline = max(1, index)
+            break
+    inline_chunks, overflow = chunks[:inline], chunks[inline:]
+    if len(inline_chunks[0]) > DISCORD_MESSAGE_LIMIT:
+        overflow = inline_chunks + overflow
+        inline_chunks = ["The answer is in the attached file."]
+        inline = 0
+
+    if notice and not overflow and len(inline_chunks[-1]) + len(notice) + 1 <= DISCORD_MESSAGE_LIMIT:
+        inline_chunks[-1] += "\n" + notice
+        notice = None
+
+    await thinking_msg.edit(content=inline_chunks[0])
+    for chunk in inline_chunks[1:]:
+        await send_counted(ctx, chunk)
+    if overflow:
+        # The attachment is read as one document, so it gets the original markdown rather
+        # than the per-message fenced chunks.
+        rest = remaining_text(response, inline, limit=DISCORD_MESSAGE_LIMIT)
+        attachment = discord.File(io.BytesIO(rest.encode("utf-8")), filename="answer.md")
+        content = "The rest of the answer is in the attached file." + (f"\n{notice}" if notice else "")
+        await send_counted(ctx, content, file=attachment)
+    elif notice:
+        await send_counted(ctx, notice)
+
+    details = {
+        "response_chars": len(response),
+        "chunks": len(chunks),
+        "messages": len(inline_chunks) + (1 if overflow or notice else 0),
+        "attached_chunks": len(overflow),
+        "delivery_seconds": round(time.time() - start_time, 3),
+    }
+    log_usage_metric("response_delivery", details, filename=METRICS_FILE)
+    return details
+
+
+@bot.event
+async def setup_hook():
+    global _warmup_task
+    _warmup_task = asyncio.create_task(warm_up_retrieval())
+
+
 @bot.event
 async def on_ready():
     print(f"{bot.user} is online and ready to answer Hytale modding questions!")
@@ -41,7 +155,7 @@ async def hy_command(ctx: commands.Context, *, query: str = None):
     start_time = time.time()
 
     if query is None or not query.strip():
-        await ctx.send(
+        await send_counted(ctx, 
             "Please ask a question about the Hytale server codebase after the command!\n"
             "Example: `!hy How does the weather system work?`"
         )
@@ -67,10 +181,31 @@ async def hy_command(ctx: commands.Context, *, query: str = None):
 
     current_history = histories[user_id]
 
-    thinking_msg = await ctx.send("Processing...")
+    warmup_wait = 0.0
+    if retrieval_ready.is_set():
+        thinking_msg = await send_counted(ctx, "Processing...")
+    else:
+        thinking_msg = await send_counted(ctx, "Starting up, your question is queued and will be answered shortly...")
+        wait_start = time.time()
+        try:
+            await asyncio.wait_for(retrieval_ready.wait(), timeout=WARMUP_QUEUE_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            await thinking_msg.edit(content="I'm still starting up. Please try again in a minute.")
+            log_usage_metric("command_invocation", {
+                "command": "hy",
+                "user_id": user_id_str,
+                "success": False,
+                "duration_seconds": round(time.time() - start_time, 3),
+                "query_char_count": query_length,
+                "new_conversation": new_conversation,
+                "reason": "not_ready",
+            }, filename=METRICS_FILE)
+            return
+        warmup_wait = time.time() - wait_start
+        await thinking_msg.edit(content="Processing...")
 
     success = False
-    response_chunks = 0
+    delivery = {}
     history_trimmed = False
     error_reason = None
 
@@ -88,18 +223,8 @@ async def hy_command(ctx: commands.Context, *, query: str = None):
         histories[user_id] = new_history
         history_trimmed = trimmed
 
-        chunks = split_into_messages(response, limit=MESSAGE_CHUNK_LIMIT)
-        response_chunks = len(chunks)
-
-        if response_chunks == 1:
-            await thinking_msg.edit(content=chunks[0])
-        else:
-            await thinking_msg.edit(content=chunks[0])
-            for chunk in chunks[1:]:
-                await ctx.send(chunk)
-
-        if trimmed:
-            await ctx.send("Conversation history was trimmed to prevent token overflow.")
+        notice = "Conversation history was trimmed to prevent token overflow." if trimmed else None
+        delivery = await deliver_response(ctx, thinking_msg, response, notice=notice)
 
         success = True
 
@@ -119,10 +244,14 @@ async def hy_command(ctx: commands.Context, *, query: str = None):
             "query_char_count": query_length,
             "new_conversation": new_conversation,
         }
+        if warmup_wait:
+            metric_details["warmup_wait_seconds"] = round(warmup_wait, 3)
 
         if success:
             metric_details.update({
-                "response_chunks": response_chunks,
+                "response_chunks": delivery["chunks"],
+                "response_messages": delivery["messages"],
+                "delivery_seconds": delivery["delivery_seconds"],
                 "history_trimmed": history_trimmed,
             })
         else:
@@ -142,7 +271,7 @@ async def clear_history(ctx: commands.Context):
     if history_existed:
         del histories[user_id]
 
-    await ctx.send("Your conversation history has been cleared!")
+    await send_counted(ctx, "Your conversation history has been cleared!")
 
     duration = time.time() - start_time
 
@@ -0,0 +1,148 @@
+# embedding_server.py
+import json
+import queue
+import threading
+import time
+import traceback
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Tuple
+
+import numpy as np
+
+from src.adapters.retrieval import LocalEmbedder
+from src.config import (
+    EMBEDDING_MODEL_NAME,
+    EMBEDDING_SERVER_HOST,
+    EMBEDDING_SERVER_PORT,
+    EMBEDDING_SERVER_MAX_BATCH,
+    EMBEDDING_SERVER_MAX_WAIT_MS,
+)
+
+
+class EmbeddingBatcher:
+    """Collects texts from concurrent requests and encodes them in shared batches.
+
+    A single worker thread owns the model. The first waiting request opens a batch that
+    closes after EMBEDDING_SERVER_MAX_WAIT_MS or once EMBEDDING_SERVER_MAX_BATCH texts
+    have joined; each request then gets its own rows back.
+    """
+
+    def __init__(self, embedder: LocalEmbedder, max_batch: int, max_wait_ms: float):
+        self.embedder = embedder
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.requests: "queue.Queue[Tuple[List[str], Future]]" = queue.Queue()
+        self.batches = 0
+        self.texts = 0
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        future: Future = Future()
+        self.requests.put((texts, future))
+        return future.result()
+
+    def _run(self):
+        while True:
+            pending = [self.requests.get()]
+            count = len(pending[0][0])
+            deadline = time.perf_counter() + self.max_wait
+            while count < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                pending.append(item)
+                count += len(item[0])
+
+            texts = [text for request_texts, _ in pending for text in request_texts]
+            try:
+                vectors = np.asarray(self.embedder.encode(texts, batch_size=self.max_batch), dtype="<f4")
+            except Exception as exc:
+                for _, future in pending:
+                    future.set_exception(exc)
+                continue
+
+            self.batches += 1
+            self.texts += len(texts)
+            start = 0
+            for request_texts, future in pending:
+                future.set_result(vectors[start:start + len(request_texts)])
+                start += len(request_texts)
+
+
+def make_handler(batcher: EmbeddingBatcher, dimension: int):
+    class EmbeddingHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, so clients reuse connections
+
+        def do_GET(self):
+            if self.path != "/health":
+                self.send_error(404)
+                return
+            self._send(200, "application/json", json.dumps({
+                "model": EMBEDDING_MODEL_NAME,
+                "dimension": dimension,
+                "batches": batcher.batches,
+                "texts": batcher.texts,
+            }).encode())
+
+        def do_POST(self):
+            if self.path != "/embed":
+                self.send_error(404)
+                return
+            try:
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                texts = json.loads(body)["texts"]
+                if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+                    raise ValueError("'texts' must be a list of strings")
+            except Exception as exc:
+                self._send(400, "text/plain", str(exc).encode())
+                return
+
+            try:
+                vectors = batcher.encode(texts) if texts else np.zeros((0, dimension), dtype="<f4")
+            except Exception:
+                traceback.print_exc()
+                self._send(500, "text/plain", b"embedding failed")
+                return
+            self._send(200, "application/octet-stream", vectors.tobytes(), {
+                "X-Embedding-Shape": f"{vectors.shape[0]},{vectors.shape[1]}",
+            })
+
+        def _send(self, status: int, content_type: str, body: bytes, headers: dict = None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # One line per query would drown the output
+
+    return EmbeddingHandler
+
+
+def main(host: str = EMBEDDING_SERVER_HOST, port: int = EMBEDDING_SERVER_PORT):
+    embedder = LocalEmbedder()
+    print(f"Loading embedding model {EMBEDDING_MODEL_NAME}...")
+    embedder.encode(["warm up"])
+    batcher = EmbeddingBatcher(embedder, EMBEDDING_SERVER_MAX_BATCH, EMBEDDING_SERVER_MAX_WAIT_MS)
+
+    server = ThreadingHTTPServer((host, port), make_handler(batcher, embedder.dimension()))
+    server.daemon_threads = True
+    print(f"Embedding server listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
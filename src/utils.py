@@ -1,115 +1,182 @@
 import datetime
 import json
 import sys
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
 import hashlib
 
+LINE_BREAKS = "\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029"  # Everything str.splitlines() splits on
+
+
+class MessageSplitter:
+    """Incremental version of `split_into_messages`: feed text as it arrives, get messages out.
+
+    `feed` returns the messages completed by a piece; `finish` returns the rest. Once the
+    text is known to be longer than `limit`, messages are emitted as soon as they are full.
+    Lengths are kept as running counters and lines are joined only once, when a message is
+    emitted, so the work is linear in the length of the text.
+    """
+
+    def __init__(self, limit: int = 1950):
+        self.limit = limit
+        self._head: List[str] = []  # Raw text until it is known not to fit in one message
+        self._head_length = 0
+        self._streaming = False
+        self._partial: List[str] = []  # The current, not yet terminated line
+        self._pending_cr = False  # The partial line ends in "\r", which may be half of "\r\n"
+        self._out: List[str] = []
+        self._consumed = 0  # Raw characters split into lines so far
+        # For each message: the raw offset after it, and the fence reopening a code block cut there
+        self.ends: List[Tuple[int, str]] = []
+
+        self._in_code = False
+        self._lines: List[str] = []  # Lines of the current text section or code message
+        self._length = 0
+        self._header = ""
+        self._code_seen = False  # Whether the current code block has any line yet
+
+    def feed(self, piece: str) -> List[str]:
+        if not self._streaming:
+            self._head.append(piece)
+            self._head_length += len(piece)
+            if self._head_length <= self.limit:
+                return []
+            self._streaming = True
+            piece = "".join(self._head)
+            self._head = []
+        self._feed_lines(piece)
+        return self._take()
+
+    def finish(self) -> List[str]:
+        if not self._streaming:
+            # Fits in one message: send it untouched.
+            self.ends.append((self._head_length, ""))
+            return ["".join(self._head)]
+        if self._partial:
+            self._line("".join(self._partial))
+            self._partial = []
+        if self._in_code:
+            if self._code_seen:  # Unclosed block: close it; an empty unclosed block is dropped
+                self._emit_code()
+        elif self._length:
+            self._emit_text()
+        return self._take()
+
+    def _take(self) -> List[str]:
+        out, self._out = self._out, []
+        return out
+
+    def _feed_lines(self, piece: str):
+        if not piece:
+            return
+        if self._pending_cr:
+            self._pending_cr = False
+            if piece[0] == "\n":
+                self._partial.append("\n")
+                piece = piece[1:]
+            self._line("".join(self._partial))
+            self._partial = []
+
+        segments = piece.splitlines(keepends=True)
+        for index, segment in enumerate(segments):
+            self._partial.append(segment)
+            if index < len(segments) - 1:
+                ended = True
+            elif segment[-1] == "\r":
+                self._pending_cr = True
+                ended = False
+            else:
+                ended = segment[-1] in LINE_BREAKS
+            if ended:
+                self._line("".join(self._partial))
+                self._partial = []
+
+    def _line(self, line: str):
+        start = self._consumed
+        self._consumed += len(line)
+        stripped = line.strip()
+        if self._in_code:
+            if stripped.startswith("```"):
+                # Closing fence
+                if self._code_seen:
+                    self._emit_code()
+                elif len(self._header) + len("```\n") <= self.limit:
+                    self._out.append(self._header + "```\n")  # Empty block, sent as is
+                    self.ends.append((self._consumed, ""))
+                self._in_code = False
+            else:
+                self._code_line(line, start)
+        elif stripped.startswith("```"):
+            # Opening fence
+            if self._length:
+                self._emit_text(start)
+            lang = stripped[3:].strip()  # Empty string if no language
+            self._header = f"```{lang}\n" if lang else "```\n"
+            self._in_code = True
+            self._code_seen = False
+        else:
+            # Text is split line by line, never mid-line
+            if self._length + len(line) > self.limit and self._length:
+                self._emit_text(start)
+            self._lines.append(line)
+            self._length += len(line)
+
+    def _code_line(self, line: str, start: int):
+        # Very long code blocks are split into several fenced messages with the same language tag
+        if len(self._header) + self._length + len(line) + len("```\n") > self.limit and self._lines:
+            self._emit_code(start, reopen=self._header)
+        self._lines.append(line)
+        self._length += len(line)
+        self._code_seen = True
+
+    def _emit_text(self, end: int = None):
+        self._out.append("".join(self._lines))
+        self.ends.append((self._consumed if end is None else end, ""))
+        self._lines = []
+        self._length = 0
+
+    def _emit_code(self, end: int = None, reopen: str = ""):
+        self._out.append(self._header + "".join(self._lines) + "```\n")
+        self.ends.append((self._consumed if end is None else end, reopen))
+        self._lines = []
+        self._length = 0
+
+
+def iter_messages(pieces: Iterable[str], limit: int = 1950) -> Iterator[str]:
+    """Yield Discord messages for text arriving in pieces, e.g. from a streaming completion."""
+    splitter = MessageSplitter(limit)
+    for piece in pieces:
+        yield from splitter.feed(piece)
+    yield from splitter.finish()
+
+
 def split_into_messages(text: str, limit: int = 1950) -> List[str]:
     """Split long responses into multiple Discord messages.
     
     - If the entire response fits in one message, return it whole (preserves original formatting).
     - If too long, parse into text sections and code blocks.
-    - Text sections are split line-by-line (like the original function).
+    - Text sections are split line-by-line.
     - Code blocks are kept intact when possible and placed in their own dedicated message(s).
     - Very long code blocks are split into multiple dedicated code block messages (repeating the language tag for consistent syntax highlighting).
     This ensures no code block is ever cut in the middle unnecessarily and each code block appears isolated in the chunks.
     """
-    if len(text) <= limit:
-        return [text]
-
-    # --- Simple Markdown parser (handles ``` fences, including optional language) ---
-    def parse_parts(text: str):
-        parts = []
-        lines = text.splitlines(keepends=True)
-        in_code = False
-        current_lines = []
-        lang = None
-
-        for line in lines:
-            stripped = line.strip()
-            if in_code:
-                if stripped.startswith("```"):
-                    # Closing fence
-                    content = "".join(current_lines)
-                    parts.append({"type": "code", "content": content, "lang": lang})
-                    in_code = False
-                    current_lines = []
-                    lang = None
-                else:
-                    current_lines.append(line)
-            else:
-                if stripped.startswith("```"):
-                    # Opening fence
-                    if current_lines:  # Flush any pending text
-                        parts.append({"type": "text", "content": "".join(current_lines)})
-                        current_lines = []
-                    lang = stripped[3:].strip()  # Empty string if no language
-                    in_code = True
-                else:
-                    current_lines.append(line)
-
-        # Flush whatever is left
-        if current_lines:
-            if in_code:
-                parts.append({"type": "code", "content": "".join(current_lines), "lang": lang})
-            else:
-                parts.append({"type": "text", "content": "".join(current_lines)})
-        return parts
-
-    # --- Parse into alternating text/code parts ---
-    parts = parse_parts(text)
-    chunks: List[str] = []
-
-    for part in parts:
-        if part["type"] == "text":
-            # Split text exactly like the original function (line-by-line, never mid-line)
-            current = ""
-            for line in part["content"].splitlines(keepends=True):
-                if len(current) + len(line) > limit and current:
-                    chunks.append(current)
-                    current = line
-                else:
-                    current += line
-            if current:
-                chunks.append(current)
-
-        else:  # code block
-            lang = part["lang"]
-            content = part["content"]
-
-            header = f"```{lang}\n" if lang else "```\n"
-            footer = "```\n"
-            full_block = header + content + footer
-
-            # If the whole code block fits, send it in its own dedicated message
-            if len(full_block) <= limit:
-                chunks.append(full_block)
-                continue
-
-            # Otherwise, split the code block into multiple dedicated messages
-            code_lines = content.splitlines(keepends=True)
-            current_lines: List[str] = []
-
-            for line in code_lines:
-                # Check if adding this line would exceed the limit for a full fenced block
-                test = "".join(current_lines) + line
-                if len(header + test + footer) > limit:
-                    # Flush the current part
-                    if current_lines:
-                        chunk_content = "".join(current_lines)
-                        chunks.append(header + chunk_content + footer)
-                        current_lines = []
-                    # Start new part with the current line
-                    current_lines.append(line)
-                else:
-                    current_lines.append(line)
-
-            # Flush the final part
-            if current_lines:
-                chunk_content = "".join(current_lines)
-                chunks.append(header + chunk_content + footer)
-
-    return chunks
+    return list(iter_messages([text], limit))
+
+
+def remaining_text(text: str, messages: int, limit: int = 1950) -> str:
+    """The raw markdown of `text` after its first `messages` messages from `split_into_messages`.
+
+    A code block cut between two messages is reopened with its fence, so the rest reads as
+    the original text would from that point.
+    """
+    if messages <= 0:
+        return text
+    splitter = MessageSplitter(limit)
+    splitter.feed(text)
+    splitter.finish()
+    if messages >= len(splitter.ends):
+        return ""
+    end, reopen = splitter.ends[messages - 1]
+    return reopen + text[end:]
 
 
 def log_usage_metric(event: str, details: Dict[str, Any], filename: str = "usage_metrics.jsonl"):